@@ -3,7 +3,13 @@ from fastapi import Depends, HTTPException, status
 from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer
 from datetime import datetime, timedelta, timezone
-from ..schemas.users import TokenData
+import time
+import uuid
+from ..schemas.users import TokenData, USER_PRINCIPAL_PROJECTION
+from .hashing import hashing_engine
+from .cache import TTLCache
+from .sessions import session_store
+from .metrics import password_hash_duration_seconds
 from dotenv import load_dotenv
 import os
 load_dotenv()
@@ -15,6 +21,12 @@ SECRET_KEY = os.getenv("KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_DURATION = 30
 REFRESH_TOKEN_DURATION = 7
+
+# Caché de usuarios ya resueltos (clave: email) para no ir a Mongo en cada petición
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "30"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+
 class Hash():
     
     @staticmethod
@@ -53,7 +65,65 @@ class Hash():
     @staticmethod
     def verify(plain_password: str, hashed_password: str) -> bool:
         return pwd_context.verify(plain_password, hashed_password)
-    
+
+    @staticmethod
+    async def bcrypt_async(password: str) -> str:
+        """Igual que bcrypt() pero en el pool de procesos, sin bloquear el event loop"""
+        start = time.perf_counter()
+        try:
+            return await hashing_engine.run(_bcrypt_password, password)
+        finally:
+            password_hash_duration_seconds.observe(time.perf_counter() - start, "hash")
+
+    @staticmethod
+    async def verify_async(plain_password: str, hashed_password: str) -> bool:
+        """Igual que verify() pero en el pool de procesos, sin bloquear el event loop"""
+        start = time.perf_counter()
+        try:
+            return await hashing_engine.run(_verify_password, plain_password, hashed_password)
+        finally:
+            password_hash_duration_seconds.observe(time.perf_counter() - start, "verify")
+
+
+# Funciones de módulo para que el pool de procesos pueda serializarlas
+def _bcrypt_password(password: str) -> str:
+    return Hash.bcrypt(password)
+
+
+def _verify_password(plain_password: str, hashed_password: str) -> bool:
+    return Hash.verify(plain_password, hashed_password)
+
+
+async def load_principal(email: str, db, use_cache: bool = True) -> dict:
+    """
+    Usuario (sin password ni secretos) por email, desde la caché o desde Mongo.
+    Devuelve una copia: quien la reciba puede modificarla sin tocar la caché.
+    """
+    user = principal_cache.get(email) if use_cache else None
+    if user is None:
+        user = await db["users"].find_one({"email": email}, USER_PRINCIPAL_PROJECTION)
+        if user is None:
+            return None
+
+        # Convertir ObjectId a string y asegurar campos
+        user["_id"] = str(user["_id"])
+        user.setdefault("role", "customer")  # Backward compatibility
+        principal_cache.set(email, user)
+    return dict(user)
+
+
+def build_token_claims(user: dict) -> dict:
+    """
+    Claims del access token: con id, rol y versión el token basta para
+    autorizar rutas por rol sin consultar el usuario en Mongo.
+    """
+    return {
+        "sub": user["email"],
+        "uid": str(user["_id"]),
+        "role": user.get("role", "customer"),
+        "ver": user.get("token_version", 0),
+    }
+
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
@@ -74,8 +144,9 @@ def create_refresh_token(data: dict):
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_DURATION)
     
-    # Refresh tokens tienen tipo "refresh" para diferenciarlos
-    to_encode.update({"exp": expire, "type": "refresh"})
+    # Refresh tokens tienen tipo "refresh" para diferenciarlos; jti los hace
+    # únicos aunque se emitan dos en el mismo segundo (una sesión por token)
+    to_encode.update({"exp": expire, "type": "refresh", "jti": uuid.uuid4().hex})
     
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
@@ -91,16 +162,19 @@ async def refresh_access_token(refresh_token: str, db):
 
     token_data = verify_token(refresh_token, credential_exception, expected_type="refresh")
 
-    # 2. Buscar usuario en la base de datos
-    user = await db["users"].find_one({"email": token_data.email})
-    if user is None:
-        raise credential_exception
-
-    if user.get("refresh_token") != refresh_token:
+    # 2. Buscar la sesión (revocadas y válidas recientes se resuelven en memoria)
+    session = await session_store.get(db, session_store.hash_token(refresh_token))
+    if session is None:
         raise HTTPException(401, "Refresh token revocado")
 
-    # 4. Crear NUEVO access token
-    new_access_token = create_access_token(data={"sub": user["email"]})
+    # 3. Usuario dueño de la sesión. Sin caché: el rol y la versión pueden haber
+    # cambiado en otro worker y el nuevo token debe llevar los actuales
+    user = await load_principal(token_data.email, db, use_cache=False)
+    if user is None or user["_id"] != session["user_id"]:
+        raise credential_exception
+
+    # 4. Crear NUEVO access token (con el rol y la versión actuales)
+    new_access_token = create_access_token(data=build_token_claims(user))
 
     return {
         "access_token": new_access_token,
@@ -121,7 +195,13 @@ def verify_token(token: str, credential_exception, expected_type: str = None):
         if expected_type and token_type != expected_type:
             raise credential_exception
 
-        return TokenData(email=email, token_type=token_type)
+        return TokenData(
+            email=email,
+            token_type=token_type,
+            user_id=payload.get("uid"),
+            role=payload.get("role"),
+            version=payload.get("ver"),
+        )
     except JWTError:
         raise credential_exception
 
@@ -0,0 +1,7 @@
+"""Utilidades de categorías compartidas por los resúmenes materializados"""
+
+
+def category_key(category) -> str:
+    """Categoría como clave de un subdocumento de Mongo ("Sin categoría" si falta)"""
+    # Las claves de Mongo no admiten "." ni "$" al inicio
+    return (category or "Sin categoría").replace(".", "_").lstrip("$") or "Sin categoría"
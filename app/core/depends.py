@@ -1,10 +1,10 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
-from datetime import datetime, timezone
 from bson import ObjectId
 from app.database import get_db
-from app.core.auth import Hash
+from app.core.auth import Hash, verify_token, load_principal, principal_cache, PRINCIPAL_CACHE_SIZE
+from app.core.cache import TTLCache
+from app.core.profiling import profiled
 import os 
 from dotenv import load_dotenv
 
@@ -13,10 +13,49 @@ load_dotenv()
 SECRET_KEY = os.getenv("KEY")
 ALGORITHM = "HS256"
 
+# Versión de token vigente por usuario (clave: user id). El TTL acota cuánto
+# tarda el resto de workers en ver una revocación.
+TOKEN_VERSION_CACHE_TTL = float(os.getenv("TOKEN_VERSION_CACHE_TTL", "5"))
+token_version_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=TOKEN_VERSION_CACHE_TTL)
+
+
+def invalidate_principal(email: str, user_id: str = None):
+    """Borra el usuario de la caché; llamar siempre que cambie su rol o sus datos"""
+    principal_cache.invalidate(email)
+    if user_id is not None:
+        token_version_cache.invalidate(str(user_id))
+
+
+async def revoke_tokens(db, user: dict):
+    """
+    Invalida todos los access tokens emitidos al usuario incrementando su
+    token_version (cambio de rol, logout...).
+    """
+    await db["users"].update_one(
+        {"_id": ObjectId(user["_id"])},
+        {"$inc": {"token_version": 1}}
+    )
+    invalidate_principal(user["email"], user["_id"])
+
+
+async def get_token_version(user_id: str, db, use_cache: bool = True) -> int:
+    if use_cache:
+        version = token_version_cache.get(user_id)
+        if version is not None:
+            return version
+
+    user = await db["users"].find_one({"_id": ObjectId(user_id)}, {"token_version": 1})
+    if user is None:
+        return None
+    version = user.get("token_version", 0)
+    token_version_cache.set(user_id, version)
+    return version
+
 
 # Configuración OAuth2
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/user/login")
 
+@profiled("get_current_user")
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
     db = Depends(get_db)
@@ -28,50 +67,83 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    try:
-        # Decodificar token
-        payload = jwt.decode(
-            token, 
-            SECRET_KEY, 
-            algorithms=[ALGORITHM]
-        )
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-            
-        # Verificar expiración
-        exp = payload.get("exp")
-        if exp and datetime.now(timezone.utc) > datetime.fromtimestamp(exp, tz=timezone.utc):
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Token expirado"
-            )
-            
-    except JWTError:
-        raise credentials_exception
-    
-    # Buscar usuario en MongoDB
-    user = await db["users"].find_one({"email": email})
+    # Solo access tokens: un refresh token (sin "ver") no sirve como bearer
+    token_data = verify_token(token, credentials_exception, expected_type="access")
+    # Tokens anteriores a token_version cuentan como versión 0
+    token_version = token_data.version or 0
+
+    user = await load_principal(token_data.email, db)
     if user is None:
         raise credentials_exception
-    
-    # Convertir ObjectId a string y asegurar campos
-    user["_id"] = str(user["_id"])
-    user.setdefault("role", "customer")  # Backward compatibility
-    
-    return user
 
+    # La versión vigente sale de token_version_cache (TTL corto), no del perfil
+    # cacheado: así una revocación hecha en otro worker se aplica en el mismo
+    # plazo que en get_token_principal
+    current_version = await get_token_version(str(user["_id"]), db)
+    if current_version is not None and current_version != token_version:
+        # Puede que la caché tenga una versión vieja: confirmar contra Mongo
+        current_version = await get_token_version(str(user["_id"]), db, use_cache=False)
+    # Token emitido antes de un cambio de rol o logout
+    if current_version is None or current_version != token_version:
+        raise credentials_exception
+
+    if user.get("token_version", 0) != current_version:
+        # Perfil cacheado anterior al último cambio (rol...): se recarga
+        user = await load_principal(token_data.email, db, use_cache=False)
+        if user is None:
+            raise credentials_exception
+
+    return dict(user)
 
-def require_role(required_role: str):
+
+@profiled("get_token_principal")
+async def get_token_principal(
+    token: str = Depends(oauth2_scheme),
+    db = Depends(get_db)
+) -> dict:
+    """
+    Versión rápida de get_current_user: autoriza solo con los claims del token
+    (id, email, rol) y comprueba la versión del token, que suele estar en caché.
+    Tokens antiguos sin esos claims caen a la búsqueda completa.
+    """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="No se pudieron validar las credenciales",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+    token_data = verify_token(token, credentials_exception, expected_type="access")
+    if token_data.user_id is None or token_data.role is None or token_data.version is None:
+        return await get_current_user(token, db)
+
+    current_version = await get_token_version(token_data.user_id, db)
+    if current_version is not None and current_version != token_data.version:
+        # Puede que la caché tenga una versión vieja: confirmar contra Mongo
+        current_version = await get_token_version(token_data.user_id, db, use_cache=False)
+    if current_version is None or current_version != token_data.version:
+        raise credentials_exception
+
+    return {
+        "_id": token_data.user_id,
+        "email": token_data.email,
+        "role": token_data.role,
+    }
+
+
+def require_role(required_role: str, full_profile: bool = False):
     """
     Factory que crea dependencias para verificar roles específicos.
+    Por defecto decide solo con el token; con full_profile=True carga el
+    usuario completo (para rutas que necesitan todo el perfil).
     
     Ejemplo de uso en endpoint:
     @router.post("/products/add", dependencies=[Depends(require_role("seller"))])
     async def add_product(...):
         # Solo sellers pueden acceder
     """
-    def role_checker(current_user: dict = Depends(get_current_user)):
+    principal_dependency = get_current_user if full_profile else get_token_principal
+
+    def role_checker(current_user: dict = Depends(principal_dependency)):
         if current_user.get("role") != required_role:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -81,14 +153,16 @@ def require_role(required_role: str):
     return role_checker
 
 
-def require_any_role(allowed_roles: list):
+def require_any_role(allowed_roles: list, full_profile: bool = False):
     """
     Verifica que el usuario tenga AL MENOS UNO de los roles permitidos.
     
     Ejemplo:
     @router.get("/reports", dependencies=[Depends(require_any_role(["admin", "moderator"]))])
     """
-    def role_checker(current_user: dict = Depends(get_current_user)):
+    principal_dependency = get_current_user if full_profile else get_token_principal
+
+    def role_checker(current_user: dict = Depends(principal_dependency)):
         if current_user.get("role") not in allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -122,71 +196,23 @@ def require_any_role(allowed_roles: list):
 #         return None
 
 
-def verify_business_ownership():
-    """
-    Verifica que el usuario sea dueño del negocio.
-    
-    Ejemplo:
-    @router.put("/business/{business_id}/update")
-    async def update_business(
-        business_id: str,
-        current_user = Depends(verify_business_ownership(business_id))
-    ):
-        # current_user ya está verificado como dueño
-    """
-    async def ownership_checker(
-        business_id: str,
-        current_user: dict = Depends(get_current_user),
-        db = Depends(get_db)
-    ):
-        
-         # Verificar que business_id sea un string válido
-        if not business_id or not isinstance(business_id, str):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="ID de negocio inválido"
-            )
-        
-        business = await db["businesses"].find_one({
-            "_id": ObjectId(business_id),
-            "owner_id": str(current_user["_id"])
-        })
-        
-        if not business:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="No eres dueño de este negocio o no existe"
-            )
-        
-        return current_user
-    
-    return ownership_checker
+def parse_object_id(value: str, detail: str = "ID inválido") -> ObjectId:
+    """Convierte un id de la URL en ObjectId o responde 400"""
+    if not value or not ObjectId.is_valid(value):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+    return ObjectId(value)
 
 
-def verify_product_ownership():
+async def raise_not_found_or_forbidden(collection, object_id: ObjectId, not_found_detail: str, forbidden_detail: str):
     """
-    Verifica que el usuario sea dueño del producto.
-    Similar a verify_business_ownership pero para productos.
+    Se llama cuando una escritura filtrada por {_id, owner_id} no encontró nada.
+    Solo en ese caso (camino de error) se consulta si el documento existe
+    para responder 404 o 403.
     """
-    async def ownership_checker(
-        product_id: str,
-        current_user: dict = Depends(get_current_user),
-        db = Depends(get_db)
-    ):
-        product = await db["products"].find_one({
-            "_id": ObjectId(product_id),
-            "owner_id": str(current_user["_id"])
-        })
-        
-        if not product:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="No eres dueño de este producto o no existe"
-            )
-        
-        return current_user
-    
-    return ownership_checker
+    exists = await collection.find_one({"_id": object_id}, {"_id": 1})
+    if not exists:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=not_found_detail)
+    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=forbidden_detail)
 
 
 # Dependencias pre-configuradas para roles comunes (conveniencia)
@@ -195,4 +221,23 @@ require_admin = require_role("admin")
 require_customer = require_role("customer")
 
 # Dependencia para admin o seller
-require_admin_or_seller = require_any_role(["admin", "seller"])
\ No newline at end of file
+require_admin_or_seller = require_any_role(["admin", "seller"])
+
+
+async def is_admin_request(request) -> bool:
+    """
+    True si la petición trae un access token vigente de admin. Lo usa el
+    middleware de perfilado para atender la cabecera X-Profile.
+    """
+    authorization = request.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    try:
+        token_data = verify_token(token, HTTPException(status.HTTP_401_UNAUTHORIZED), expected_type="access")
+    except HTTPException:
+        return False
+    if token_data.role != "admin" or token_data.user_id is None:
+        return False
+    db = await get_db()
+    return await get_token_version(token_data.user_id, db) == token_data.version
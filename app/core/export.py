@@ -0,0 +1,74 @@
+import csv
+import io
+import json
+from datetime import datetime
+from enum import Enum
+from bson import ObjectId
+from fastapi.responses import StreamingResponse
+
+EXPORT_BATCH_SIZE = 500
+
+PRODUCT_EXPORT_FIELDS = [
+    "_id", "name", "description", "price", "stock", "category",
+    "business_id", "owner_id", "created_at", "updated_at",
+]
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+def _jsonable(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+async def _ndjson_lines(cursor):
+    async for doc in cursor:
+        row = {key: _jsonable(value) for key, value in doc.items()}
+        yield (json.dumps(row, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+
+async def _csv_lines(cursor, fields: list):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+
+    def flush() -> bytes:
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate(0)
+        return data
+
+    writer.writeheader()
+    yield flush()
+    async for doc in cursor:
+        writer.writerow({field: _jsonable(doc.get(field)) for field in fields})
+        yield flush()
+
+
+def stream_export(collection, query: dict, export_format: ExportFormat, filename: str,
+                  fields: list = PRODUCT_EXPORT_FIELDS) -> StreamingResponse:
+    """
+    Exporta una consulta fila a fila. El cursor de Motor se lee por lotes de
+    EXPORT_BATCH_SIZE y cada fila se envía en cuanto el cliente la acepta,
+    así la memoria no depende del tamaño del catálogo.
+    """
+    projection = {field: 1 for field in fields}
+    cursor = collection.find(query, projection).sort("_id", 1).batch_size(EXPORT_BATCH_SIZE)
+
+    if export_format == ExportFormat.CSV:
+        body = _csv_lines(cursor, fields)
+        media_type = "text/csv"
+    else:
+        body = _ndjson_lines(cursor)
+        media_type = "application/x-ndjson"
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format.value}"'},
+    )
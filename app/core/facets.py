@@ -0,0 +1,123 @@
+"""
+Facetas del catálogo: conteo por categoría e histograma de precios.
+
+Se calculan con una sola agregación $facet sobre el filtro de búsqueda y el
+resultado se guarda en una TTLCache corta (FACETS_CACHE_TTL) por filtro.
+Las peticiones concurrentes con el mismo filtro comparten la agregación
+(single-flight propio, facet_reads), así tras caducar una entrada Mongo solo
+la recalcula una vez por worker. Las escrituras no invalidan: la frescura la
+acota el TTL.
+
+El rango de precio se ajusta a los límites de PRICE_BUCKET_BOUNDARIES
+(mínimo hacia abajo, máximo hacia arriba): las facetas son aproximadas por
+naturaleza y así variar los decimales no genera claves de caché nuevas ni
+una agregación completa por petición.
+
+Las facetas son disyuntivas: el conteo por categoría ignora el filtro de
+categoría y el histograma ignora el de precio, para que la UI pueda mostrar
+las alternativas a la selección actual.
+"""
+import os
+from bisect import bisect_left, bisect_right
+from dotenv import load_dotenv
+from app.core.cache import TTLCache
+from app.core.singleflight import SingleFlight
+
+load_dotenv()
+
+FACETS_CACHE_TTL = float(os.getenv("FACETS_CACHE_TTL", "30"))
+FACETS_CACHE_SIZE = int(os.getenv("FACETS_CACHE_SIZE", "256"))
+FACETS_MAX_CATEGORIES = 50
+# Límites inferiores de los tramos de precio; el último tramo queda abierto
+PRICE_BUCKET_BOUNDARIES = [0, 10, 25, 50, 100, 250, 500, 1000]
+
+facets_cache = TTLCache(maxsize=FACETS_CACHE_SIZE, ttl=FACETS_CACHE_TTL)
+facet_reads = SingleFlight()
+
+
+def snap_price_range(min_price: float = None, max_price: float = None) -> tuple:
+    """Ajusta el rango a los límites de los tramos; None = sin límite por ese lado"""
+    if min_price is not None:
+        index = bisect_right(PRICE_BUCKET_BOUNDARIES, min_price) - 1
+        min_price = PRICE_BUCKET_BOUNDARIES[index] if index > 0 else None
+    if max_price is not None:
+        index = bisect_left(PRICE_BUCKET_BOUNDARIES, max_price)
+        max_price = PRICE_BUCKET_BOUNDARIES[index] if index < len(PRICE_BUCKET_BOUNDARIES) else None
+    return min_price, max_price
+
+
+def _price_filter(min_price: float = None, max_price: float = None) -> dict:
+    price = {}
+    if min_price is not None:
+        price["$gte"] = min_price
+    if max_price is not None:
+        price["$lte"] = max_price
+    return {"price": price} if price else {}
+
+
+def build_facet_pipeline(q: str = None, category: str = None, min_price: float = None, max_price: float = None) -> list:
+    base = {"$text": {"$search": q}} if q else {}
+    category_filter = {"category": category} if category else {}
+    price_filter = _price_filter(min_price, max_price)
+
+    def match(*filters) -> list:
+        merged = {key: value for f in filters for key, value in f.items()}
+        return [{"$match": merged}] if merged else []
+
+    return [
+        # $text tiene que ir en la primera etapa del pipeline
+        *match(base),
+        {"$facet": {
+            "categories": [
+                *match(price_filter),
+                {"$group": {"_id": "$category", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}},
+                {"$limit": FACETS_MAX_CATEGORIES},
+            ],
+            "price_buckets": [
+                *match(category_filter),
+                {"$bucket": {
+                    "groupBy": "$price",
+                    "boundaries": PRICE_BUCKET_BOUNDARIES + [float("inf")],
+                    "default": "other",
+                    "output": {"count": {"$sum": 1}},
+                }},
+            ],
+            "total": [
+                *match(category_filter, price_filter),
+                {"$count": "count"},
+            ],
+        }},
+    ]
+
+
+def _format_facets(result: dict) -> dict:
+    bounds = PRICE_BUCKET_BOUNDARIES + [None]
+    counts = {bucket["_id"]: bucket["count"] for bucket in result["price_buckets"]}
+    return {
+        "total": result["total"][0]["count"] if result["total"] else 0,
+        "categories": [{"name": group["_id"], "count": group["count"]} for group in result["categories"]],
+        "price_buckets": [
+            {"min": low, "max": high, "count": counts.get(low, 0)}
+            for low, high in zip(bounds, bounds[1:])
+        ],
+    }
+
+
+async def get_facets(collection, q: str = None, category: str = None,
+                     min_price: float = None, max_price: float = None) -> dict:
+    q = q.strip() if q and q.strip() else None
+    min_price, max_price = snap_price_range(min_price, max_price)
+    key = (q, category, min_price, max_price)
+    cached = facets_cache.get(key)
+    if cached is not None:
+        return cached
+
+    async def compute():
+        pipeline = build_facet_pipeline(q, category, min_price, max_price)
+        result = (await collection.aggregate(pipeline).to_list(length=1))[0]
+        facets = _format_facets(result)
+        facets_cache.set(key, facets)
+        return facets
+
+    return await facet_reads.do(key, compute)
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from fastapi import HTTPException, status
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Número de procesos dedicados a bcrypt y cuántas peticiones pueden esperar turno
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 1)))
+HASH_QUEUE_SIZE = int(os.getenv("HASH_QUEUE_SIZE", "64"))
+HASH_RETRY_AFTER = int(os.getenv("HASH_RETRY_AFTER", "1"))
+# Los procesos no se crean con fork: el worker ya tiene hilos de Motor/pymongo
+# y un fork con hilos vivos puede quedarse bloqueado
+HASH_START_METHOD = os.getenv(
+    "HASH_START_METHOD",
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+logger = logging.getLogger(__name__)
+
+
+class HashingEngine:
+    """
+    Ejecuta el hashing de contraseñas en un pool de procesos acotado,
+    fuera del event loop. Si la cola está llena responde 503 inmediatamente
+    en lugar de acumular peticiones.
+    """
+
+    def __init__(self, workers: int = HASH_WORKERS, queue_size: int = HASH_QUEUE_SIZE):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.pending = 0
+        self.rejected = 0
+        self.restarts = 0
+        self._executor = None
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(HASH_START_METHOD),
+            )
+
+    def _restart(self, broken):
+        # Si otra petición ya lo reconstruyó no se vuelve a hacer
+        if self._executor is broken:
+            logger.error("Pool de hashing roto (proceso muerto): se reconstruye")
+            self.restarts += 1
+            self.shutdown()
+            self.start()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+    async def run(self, fn, *args):
+        # Límite = procesos ocupados + cola de espera
+        if self.pending >= self.workers + self.queue_size:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Servidor ocupado, intenta de nuevo",
+                headers={"Retry-After": str(HASH_RETRY_AFTER)},
+            )
+        self.start()
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            executor = self._executor
+            try:
+                return await loop.run_in_executor(executor, fn, *args)
+            except BrokenProcessPool:
+                # Un proceso murió: sin reconstruir, todos los logins fallarían desde ahora.
+                # bcrypt no tiene efectos, así que se reintenta una vez
+                self._restart(executor)
+                return await loop.run_in_executor(self._executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "pending": self.pending,
+            "rejected": self.rejected,
+            "restarts": self.restarts,
+        }
+
+
+hashing_engine = HashingEngine()
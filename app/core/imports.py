@@ -0,0 +1,101 @@
+import codecs
+import csv
+import io
+import json
+from fastapi import HTTPException, status
+from app.core.export import ExportFormat
+
+IMPORT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+# Tope de una línea (o registro CSV) sin terminar: acota la memoria por petición
+MAX_IMPORT_LINE_LENGTH = 64 * 1024
+
+
+def _line_too_long():
+    return HTTPException(
+        status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        f"Línea de más de {MAX_IMPORT_LINE_LENGTH} caracteres en el archivo"
+    )
+
+
+async def _iter_lines(stream):
+    """Parte el cuerpo de la petición en líneas sin cargarlo entero en memoria"""
+    # Decodificador incremental: un carácter multibyte puede quedar partido entre dos chunks
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    try:
+        async for chunk in stream:
+            pending += decoder.decode(chunk)
+            *lines, pending = pending.split("\n")
+            for line in lines:
+                if len(line) > MAX_IMPORT_LINE_LENGTH:
+                    raise _line_too_long()
+                yield line.rstrip("\r")
+            if len(pending) > MAX_IMPORT_LINE_LENGTH:
+                raise _line_too_long()
+        pending += decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "El archivo debe estar codificado en UTF-8")
+    if pending.strip():
+        yield pending.rstrip("\r")
+
+
+async def _iter_csv_records(stream):
+    # Un registro CSV puede ocupar varias líneas si tiene comillas: se acumula
+    # hasta que el número de comillas es par
+    record = ""
+    async for line in _iter_lines(stream):
+        record = f"{record}\n{line}" if record else line
+        if len(record) > MAX_IMPORT_LINE_LENGTH:
+            raise _line_too_long()
+        if record.count('"') % 2 == 0:
+            yield record
+            record = ""
+    if record:
+        yield record
+
+
+async def iter_import_rows(stream, import_format: ExportFormat):
+    """
+    Genera (número de fila, dict) o (número de fila, mensaje de error) a partir
+    de un upload NDJSON o CSV. Para CSV la primera línea es la cabecera.
+    """
+    if import_format == ExportFormat.NDJSON:
+        row_number = 0
+        async for line in _iter_lines(stream):
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield row_number, f"JSON inválido: {e.msg}"
+                continue
+            if not isinstance(row, dict):
+                yield row_number, "Cada línea debe ser un objeto JSON"
+                continue
+            yield row_number, row
+        return
+
+    header = None
+    row_number = 0
+    async for record in _iter_csv_records(stream):
+        if not record.strip():
+            continue
+        values = next(csv.reader(io.StringIO(record)))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        row_number += 1
+        if len(values) != len(header):
+            yield row_number, f"Se esperaban {len(header)} columnas y hay {len(values)}"
+            continue
+        # En CSV una celda vacía equivale a "sin valor"
+        yield row_number, {key: (value if value != "" else None) for key, value in zip(header, values)}
+
+
+def format_validation_error(error) -> str:
+    """Resume un ValidationError de Pydantic en una línea"""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors()
+    )
@@ -0,0 +1,153 @@
+"""
+Registro declarativo de índices de MongoDB.
+
+Los índices se aplican al arrancar la app (create_indexes es idempotente) y
+check_query_plans() ejecuta explain sobre las consultas de los routers para
+detectar cualquier COLLSCAN.
+
+Uso en CI / despliegue:
+    python -m app.core.indexes --check
+"""
+import asyncio
+import os
+import sys
+from datetime import datetime, timezone
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Si está activo, la app no arranca si alguna consulta hace COLLSCAN
+MONGODB_CHECK_QUERY_PLANS = os.getenv("MONGODB_CHECK_QUERY_PLANS", "0") == "1"
+
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+    ],
+    "businesses": [
+        IndexModel([("owner_id", ASCENDING), ("_id", ASCENDING)], name="owner_id_id"),
+        IndexModel([("created_at", ASCENDING), ("_id", ASCENDING)], name="created_at_id"),
+    ],
+    "products": [
+        IndexModel([("owner_id", ASCENDING), ("_id", ASCENDING)], name="owner_id_id"),
+        IndexModel([("price", ASCENDING), ("_id", ASCENDING)], name="price_id"),
+        IndexModel([("created_at", ASCENDING), ("_id", ASCENDING)], name="created_at_id"),
+        # Búsqueda: texto sobre name/description y filtros por categoría + precio
+        IndexModel(
+            [("name", TEXT), ("description", TEXT)],
+            weights={"name": 3, "description": 1},
+            default_language="spanish",
+            name="search_text",
+        ),
+        IndexModel([("category", ASCENDING), ("price", ASCENDING), ("_id", ASCENDING)], name="category_price_id"),
+        # Storefront: productos de un negocio por precio (y límites del resumen)
+        IndexModel([("business_id", ASCENDING), ("price", ASCENDING), ("_id", ASCENDING)], name="business_id_price_id"),
+    ],
+    "sessions": [
+        # Mongo borra cada sesión al llegar a su expires_at
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_at_ttl"),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_id_created_at"),
+    ],
+    "reservations": [
+        # Reservas pendientes caducadas (las libera reservation_reaper)
+        IndexModel([("status", ASCENDING), ("expires_at", ASCENDING)], name="status_expires_at"),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_id_created_at"),
+        # Los documentos ya cerrados se borran un día después de caducar. Las
+        # pendientes nunca: su stock solo vuelve si el reaper las reclama
+        IndexModel(
+            [("expires_at", ASCENDING)], expireAfterSeconds=86400, name="closed_expires_at_ttl",
+            partialFilterExpression={"status": {"$in": ["confirmed", "cancelled", "expired", "failed"]}},
+        ),
+    ],
+    "orders": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_id_created_at"),
+    ],
+}
+
+# Índices sustituidos por otros del registro: ensure_indexes los borra si existen
+OBSOLETE_INDEXES = {
+    # TTL sin filtro: borraba también reservas pendientes con stock retenido
+    "reservations": ["expires_at_ttl"],
+}
+
+# Consultas representativas de los routers: (colección, filtro, orden)
+_sample_id = ObjectId()
+_sample_owner = str(ObjectId())
+
+QUERY_PLANS = [
+    ("users", {"email": "plan-check@example.com"}, None),                        # login, registration, get_current_user
+    ("users", {"_id": _sample_id}, None),                                        # token_version
+    ("users", {}, [("_id", ASCENDING)]),                                         # get_all_users
+    ("businesses", {"owner_id": _sample_owner}, None),                           # add_product
+    ("businesses", {"_id": _sample_id, "owner_id": _sample_owner}, None),        # update/delete_business (filtro de dueño)
+    ("businesses", {}, [("created_at", DESCENDING), ("_id", DESCENDING)]),       # get_all_businesses
+    ("products", {"owner_id": _sample_owner}, [("_id", ASCENDING)]),            # get_my_products / export
+    ("products", {"_id": _sample_id, "owner_id": _sample_owner}, None),          # update/delete_product (filtro de dueño)
+    ("products", {}, [("price", ASCENDING), ("_id", ASCENDING)]),                # get_all_products?sort=price
+    ("products", {}, [("created_at", DESCENDING), ("_id", DESCENDING)]),         # get_all_products?sort=created_at
+    ("products", {"category": "plan-check", "price": {"$gte": 1, "$lte": 100}},
+     [("price", ASCENDING), ("_id", ASCENDING)]),                                # search por categoría y precio
+    ("products", {"$text": {"$search": "plan check"}}, None),                    # search por texto
+    ("products", {"business_id": _sample_owner}, [("price", ASCENDING), ("_id", ASCENDING)]),  # storefront
+    ("sessions", {"user_id": _sample_owner}, [("created_at", DESCENDING)]),     # sesiones del usuario
+    ("reservations", {"status": {"$in": ["pending", "reserving"]}, "expires_at": {"$lte": datetime.now(timezone.utc)}}, None),  # reaper
+]
+
+
+async def ensure_indexes(db):
+    """Crea los índices del registro; si ya existen no hace nada"""
+    for collection, names in OBSOLETE_INDEXES.items():
+        existing = await db[collection].index_information()
+        for name in names:
+            if name in existing:
+                await db[collection].drop_index(name)
+    for collection, indexes in INDEXES.items():
+        await db[collection].create_indexes(indexes)
+
+
+def _find_stages(plan: dict, stage: str) -> bool:
+    if plan.get("stage") == stage:
+        return True
+    children = []
+    if "inputStage" in plan:
+        children.append(plan["inputStage"])
+    children.extend(plan.get("inputStages", []))
+    return any(_find_stages(child, stage) for child in children)
+
+
+async def check_query_plans(db) -> list:
+    """Devuelve las consultas cuyo plan ganador incluye un COLLSCAN"""
+    failures = []
+    for collection, query, sort in QUERY_PLANS:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+        # En versiones recientes el plan viene envuelto en queryPlan
+        winning_plan = winning_plan.get("queryPlan", winning_plan)
+        if _find_stages(winning_plan, "COLLSCAN"):
+            failures.append({"collection": collection, "filter": query, "sort": sort})
+    return failures
+
+
+async def _main() -> int:
+    from app.database import connect_to_mongo, close_mongo_connection, get_db
+
+    connect_to_mongo()
+    try:
+        db = await get_db()
+        await ensure_indexes(db)
+        if "--check" not in sys.argv:
+            return 0
+        failures = await check_query_plans(db)
+        for failure in failures:
+            print(f"COLLSCAN en {failure['collection']}: filtro={failure['filter']} orden={failure['sort']}")
+        return 1 if failures else 0
+    finally:
+        close_mongo_connection()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main()))
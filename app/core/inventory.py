@@ -0,0 +1,218 @@
+"""
+Reservas de stock sin sobreventa.
+
+Cada unidad se descuenta con un $inc condicional (stock >= cantidad) sobre el
+propio producto: es atómico en Mongo y no necesita transacciones ni locks,
+incluso con mucha contención sobre el mismo producto. Si un ítem del carrito
+falla, se devuelve el stock de los ya reservados (compensación).
+
+La reserva se inserta antes de tocar el stock, en estado "reserving", y cada
+$inc deja en el producto una marca con el id de la reserva
+(inflight_reservations). Si el proceso muere a mitad, el reaper libera la
+reserva devolviendo solo lo que lleva marca (quitarla y devolver el stock es
+una sola operación, así que es idempotente). Las marcas solo viven mientras
+la reserva se está creando: al pasar a "pending" se borran, y el array del
+producto caliente no crece con cada carrito abierto. Una reserva "pending"
+la cierra un único claim atómico, que es quien devuelve su stock.
+
+Las reservas caducan a los RESERVATION_TTL_SECONDS; una tarea de fondo las
+reclama y devuelve su stock, y un índice TTL borra los documentos ya cerrados.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from fastapi import HTTPException, status
+from pymongo import ReturnDocument
+from dotenv import load_dotenv
+from app.core.seller_stats import on_stock_changed
+
+load_dotenv()
+
+RESERVATION_TTL_SECONDS = int(os.getenv("RESERVATION_TTL_SECONDS", "900"))
+RESERVATION_REAPER_INTERVAL = float(os.getenv("RESERVATION_REAPER_INTERVAL", "30"))
+# Tiempo máximo de una reserva en "reserving" antes de que el reaper la dé por fallida
+RESERVING_TIMEOUT_SECONDS = int(os.getenv("RESERVING_TIMEOUT_SECONDS", "60"))
+
+logger = logging.getLogger(__name__)
+
+
+# Lo que necesita el rollup del vendedor tras cada $inc de stock
+STOCK_CHANGE_PROJECTION = {"name": 1, "price": 1, "stock": 1, "category": 1, "owner_id": 1}
+
+
+async def _restore_stock(db, reservation_id: ObjectId, items: list, marked: bool = False) -> list:
+    """
+    Devuelve el stock de los ítems. Con marked=True (reserva que no llegó a
+    "pending") solo los que aún llevan la marca de la reserva.
+    Retorna [(post-imagen, unidades devueltas)] para el rollup del vendedor.
+    """
+    changes = []
+    for item in items:
+        query = {"_id": ObjectId(item["product_id"])}
+        update = {"$inc": {"stock": item["quantity"]}}
+        if marked:
+            query["inflight_reservations.reservation_id"] = reservation_id
+            update["$pull"] = {"inflight_reservations": {"reservation_id": reservation_id}}
+        product = await db["products"].find_one_and_update(
+            query, update, projection=STOCK_CHANGE_PROJECTION, return_document=ReturnDocument.AFTER
+        )
+        if product is not None:
+            changes.append((product, item["quantity"]))
+    return changes
+
+
+async def _clear_marks(db, reservation_id: ObjectId, items: list):
+    """Reserva ya "pending": la marca de cada producto sobra"""
+    await db["products"].update_many(
+        {"_id": {"$in": [ObjectId(item["product_id"]) for item in items]}},
+        {"$pull": {"inflight_reservations": {"reservation_id": reservation_id}}}
+    )
+
+
+async def reserve_items(db, user_id: str, items: list) -> dict:
+    """
+    Descuenta el stock de cada ítem y crea la reserva. items: [{product_id, quantity}].
+    Lanza 409 (sin stock) o 404 (no existe) dejando el stock como estaba.
+    """
+    for item in items:
+        if not ObjectId.is_valid(item["product_id"]):
+            raise HTTPException(status.HTTP_400_BAD_REQUEST, f"ID de producto inválido: {item['product_id']}")
+
+    # Primero la reserva con los ítems previstos: si el proceso muere tras un
+    # $inc, el reaper la encuentra y devuelve lo descontado
+    now = datetime.now(timezone.utc)
+    intended = [{"product_id": item["product_id"], "quantity": item["quantity"]} for item in items]
+    result = await db["reservations"].insert_one({
+        "user_id": str(user_id),
+        "items": intended,
+        "status": "reserving",
+        "created_at": now,
+        "expires_at": now + timedelta(seconds=RESERVING_TIMEOUT_SECONDS),
+    })
+    reservation_id = result.inserted_id
+
+    reserved, changes = [], []
+    try:
+        for item in items:
+            object_id = ObjectId(item["product_id"])
+            product = await db["products"].find_one_and_update(
+                {"_id": object_id, "stock": {"$gte": item["quantity"]}},
+                {
+                    "$inc": {"stock": -item["quantity"]},
+                    "$push": {"inflight_reservations": {"reservation_id": reservation_id, "quantity": item["quantity"]}},
+                },
+                projection=STOCK_CHANGE_PROJECTION,
+                return_document=ReturnDocument.AFTER
+            )
+            if product is None:
+                exists = await db["products"].find_one({"_id": object_id}, {"_id": 1})
+                if not exists:
+                    raise HTTPException(status.HTTP_404_NOT_FOUND, f"Producto no encontrado: {item['product_id']}")
+                raise HTTPException(status.HTTP_409_CONFLICT, f"Stock insuficiente: {item['product_id']}")
+            reserved.append({
+                "product_id": item["product_id"],
+                "name": product["name"],
+                "quantity": item["quantity"],
+                "price": product["price"],
+            })
+            changes.append((product, -item["quantity"]))
+
+        now = datetime.now(timezone.utc)
+        reservation = await db["reservations"].find_one_and_update(
+            {"_id": reservation_id, "status": "reserving"},
+            {"$set": {
+                "items": reserved,
+                "total": round(sum(item["price"] * item["quantity"] for item in reserved), 2),
+                "status": "pending",
+                "expires_at": now + timedelta(seconds=RESERVATION_TTL_SECONDS),
+            }},
+            return_document=ReturnDocument.AFTER
+        )
+        if reservation is None:
+            # El reaper la dio por fallida mientras se procesaba
+            raise HTTPException(status.HTTP_409_CONFLICT, "La reserva caducó mientras se procesaba, inténtalo de nuevo")
+    except BaseException:
+        # Compensación: devolver lo que ya se había descontado. El rollup del
+        # vendedor solo ve reservas completas, así que aquí no hay nada que deshacer
+        await db["reservations"].update_one(
+            {"_id": reservation_id, "status": "reserving"},
+            {"$set": {"status": "failed"}}
+        )
+        await _restore_stock(db, reservation_id, intended, marked=True)
+        raise
+
+    # Primero "pending" y después fuera marcas: si el proceso muere entre
+    # medias solo quedan marcas huérfanas, nunca una reserva sin rastro
+    await _clear_marks(db, reservation_id, reserved)
+    # Una escritura al rollup por vendedor para toda la reserva
+    await on_stock_changed(db, changes)
+    return reservation
+
+
+async def claim_reservation(db, reservation_id: ObjectId, user_id: str, new_status: str) -> dict:
+    """
+    Pasa una reserva pendiente y vigente a new_status de forma atómica, así
+    confirmar, cancelar y caducar nunca se aplican dos veces a la misma reserva.
+    """
+    now = datetime.now(timezone.utc)
+    reservation = await db["reservations"].find_one_and_update(
+        {"_id": reservation_id, "user_id": str(user_id), "status": "pending", "expires_at": {"$gt": now}},
+        {"$set": {"status": new_status, "updated_at": now}},
+        return_document=ReturnDocument.AFTER
+    )
+    if reservation is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Reserva no encontrada, caducada o ya cerrada")
+    return reservation
+
+
+async def complete_reservation(db, reservation_id: ObjectId, user_id: str) -> dict:
+    return await claim_reservation(db, reservation_id, user_id, "confirmed")
+
+
+async def cancel_reservation(db, reservation_id: ObjectId, user_id: str) -> dict:
+    reservation = await claim_reservation(db, reservation_id, user_id, "cancelled")
+    await on_stock_changed(db, await _restore_stock(db, reservation_id, reservation["items"]))
+    return reservation
+
+
+async def release_expired_reservations(db) -> int:
+    """
+    Reclama una a una las reservas caducadas y devuelve su stock. Incluye las
+    que se quedaron en "reserving" (proceso caído a mitad de reservar).
+    """
+    released = 0
+    while True:
+        now = datetime.now(timezone.utc)
+        reservation = await db["reservations"].find_one_and_update(
+            {"status": {"$in": ["pending", "reserving"]}, "expires_at": {"$lte": now}},
+            [{"$set": {
+                "status": {"$cond": [{"$eq": ["$status", "pending"]}, "expired", "failed"]},
+                "updated_at": now,
+            }}]
+        )
+        if reservation is None:
+            return released
+        # Solo las reservas que no llegaron a "pending" conservan marcas (y no
+        # contaron en el rollup del vendedor)
+        pending = reservation["status"] == "pending"
+        changes = await _restore_stock(db, reservation["_id"], reservation["items"], marked=not pending)
+        if pending:
+            await on_stock_changed(db, changes)
+        released += 1
+
+
+async def reservation_reaper(get_db):
+    """Tarea de fondo del lifespan: libera reservas abandonadas periódicamente"""
+    while True:
+        await asyncio.sleep(RESERVATION_REAPER_INTERVAL)
+        try:
+            db = await get_db()
+            released = await release_expired_reservations(db)
+            if released:
+                logger.info("Reservas caducadas liberadas: %s", released)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Error liberando reservas caducadas")
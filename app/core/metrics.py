@@ -0,0 +1,221 @@
+"""
+Métricas en formato de texto de Prometheus, sin dependencias externas.
+
+Registrar una observación es una búsqueda en un dict y un bisect, así que se
+puede dejar activo siempre. Las cachés y demás componentes con contadores
+propios se exponen como colectores que se leen solo al servir /metrics.
+"""
+import time
+from bisect import bisect_left
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+
+    def inc(self, *labels, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, value: float, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            # [contador por bucket..., +Inf], suma
+            series = [[0] * (len(self.buckets) + 1), 0.0]
+            self._series[labels] = series
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(names, labels + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Gauges:
+    """Familia de gauges calculada al vuelo a partir de una función"""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple, collect):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.collect = collect
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for labels, value in self.collect():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+###########---MÉTRICAS DE LA APP---###########
+
+http_requests_total = Counter(
+    "http_requests_total", "Peticiones HTTP atendidas", ("method", "route", "status")
+)
+http_request_duration_seconds = Histogram(
+    "http_request_duration_seconds", "Latencia de las peticiones HTTP", ("method", "route", "status")
+)
+mongo_command_duration_seconds = Histogram(
+    "mongo_command_duration_seconds", "Duración de los comandos de MongoDB", ("collection", "command", "outcome")
+)
+password_hash_duration_seconds = Histogram(
+    "password_hash_duration_seconds", "Tiempo de bcrypt (cola del pool incluida)", ("operation",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.5, 5.0),
+)
+
+_caches = {}
+_stats_sources = {}
+
+
+def register_cache(name: str, cache):
+    """Expone hits, misses, tamaño y ratio de cualquier objeto con stats() de caché"""
+    _caches[name] = cache
+
+
+def register_stats(name: str, stats):
+    """Expone como gauges los valores numéricos de stats() (pool de Mongo, limitadores...)"""
+    _stats_sources[name] = stats
+
+
+def _collect_caches():
+    for name, cache in _caches.items():
+        stats = cache.stats()
+        for key in ("hits", "misses", "size", "hit_ratio"):
+            yield (name, key), stats[key]
+
+
+def _collect_stats():
+    for name, stats in _stats_sources.items():
+        for key, value in stats().items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                yield (name, key), value
+
+
+_families = [
+    http_requests_total,
+    http_request_duration_seconds,
+    mongo_command_duration_seconds,
+    password_hash_duration_seconds,
+    Gauges("cache_stats", "Estadísticas de las cachés en memoria", ("cache", "stat"), _collect_caches),
+    Gauges("component_stats", "Contadores internos de componentes", ("component", "stat"), _collect_stats),
+]
+
+
+def render_metrics() -> str:
+    lines = []
+    for family in _families:
+        lines.extend(family.render())
+    return "\n".join(lines) + "\n"
+
+
+###########---MONGO---###########
+
+def command_collection(event) -> str:
+    """Colección del comando; getMore la lleva en "collection" (su valor es el id del cursor)"""
+    if event.command_name == "getMore":
+        target = event.command.get("collection")
+    else:
+        target = event.command.get(event.command_name)
+    return target if isinstance(target, str) else "-"
+
+
+class CommandTimingListener(monitoring.CommandListener):
+    """Mide cada comando de Mongo por colección usando el command monitoring de pymongo"""
+
+    def __init__(self):
+        self._collections = {}
+
+    def started(self, event):
+        self._collections[(event.connection_id, event.request_id)] = command_collection(event)
+
+    def _finish(self, event, outcome: str):
+        collection = self._collections.pop((event.connection_id, event.request_id), "-")
+        mongo_command_duration_seconds.observe(
+            event.duration_micros / 1_000_000, collection, event.command_name, outcome
+        )
+
+    def succeeded(self, event):
+        self._finish(event, "ok")
+
+    def failed(self, event):
+        self._finish(event, "error")
+
+
+command_timing = CommandTimingListener()
+
+
+###########---HTTP---###########
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI puro (sin BaseHTTPMiddleware): no añade tareas ni streams
+    por petición, solo lee el status del mensaje http.response.start.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Plantilla de la ruta (/products/update/{product_id}), no la URL real.
+            # El router la deja en el propio scope al resolver la petición
+            route = scope.get("route")
+            route_path = route.path if route is not None else "unmatched"
+            labels = (scope["method"], route_path, str(status_code))
+            http_requests_total.inc(*labels)
+            http_request_duration_seconds.observe(time.perf_counter() - start, *labels)
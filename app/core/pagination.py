@@ -0,0 +1,118 @@
+import base64
+from bson import json_util
+from fastapi import HTTPException, status
+from pymongo import ASCENDING, DESCENDING
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# Profundidad máxima para órdenes que no admiten keyset (p. ej. relevancia de texto)
+MAX_OFFSET = 1000
+
+
+def encode_cursor(sort_field: str, order: str, last_doc: dict) -> str:
+    """Cursor opaco con la clave de orden y el _id del último documento de la página"""
+    payload = {"f": sort_field, "o": order, "id": last_doc["_id"]}
+    if sort_field != "_id":
+        payload["v"] = last_doc.get(sort_field)
+    raw = json_util.dumps(payload).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_field: str, order: str) -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json_util.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "Cursor inválido")
+
+    # Un cursor solo vale para el mismo orden con el que se generó
+    if payload.get("f") != sort_field or payload.get("o") != order or "id" not in payload:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "El cursor no corresponde a este orden")
+    return payload
+
+
+def keyset_filter(sort_field: str, order: str, payload: dict) -> dict:
+    """
+    Filtro "a partir del último visto": con el índice {sort_field, _id} Mongo
+    salta directamente a la posición, así que el coste no crece con la profundidad.
+    """
+    op = "$gt" if order == "asc" else "$lt"
+    last_id = payload["id"]
+    if sort_field == "_id":
+        return {"_id": {op: last_id}}
+
+    last_value = payload.get("v")
+    if last_value is None:
+        # Los null van primero en orden ascendente y últimos en descendente
+        if order == "asc":
+            return {"$or": [
+                {sort_field: None, "_id": {op: last_id}},
+                {sort_field: {"$ne": None}},
+            ]}
+        return {sort_field: None, "_id": {op: last_id}}
+
+    return {"$or": [
+        {sort_field: {op: last_value}},
+        {sort_field: last_value, "_id": {op: last_id}},
+    ]}
+
+
+async def paginate(collection, query: dict, sort_field: str = "_id", order: str = "asc",
+                   limit: int = DEFAULT_PAGE_SIZE, cursor: str = None, projection: dict = None):
+    """
+    Devuelve (documentos, next_cursor). next_cursor es None en la última página.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if cursor:
+        payload = decode_cursor(cursor, sort_field, order)
+        after = keyset_filter(sort_field, order, payload)
+        query = {"$and": [query, after]} if query else after
+
+    direction = ASCENDING if order == "asc" else DESCENDING
+    sort = [(sort_field, direction)]
+    if sort_field != "_id":
+        sort.append(("_id", direction))
+
+    # Pedimos uno de más para saber si hay página siguiente
+    docs = await collection.find(query, projection).sort(sort).limit(limit + 1).to_list(length=limit + 1)
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(sort_field, order, docs[-1])
+    return docs, next_cursor
+
+
+def encode_offset_cursor(tag: str, offset: int) -> str:
+    raw = json_util.dumps({"f": tag, "off": offset}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_offset_cursor(cursor: str, tag: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json_util.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        offset = int(payload["off"])
+    except Exception:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "Cursor inválido")
+    if payload.get("f") != tag or offset < 0:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "El cursor no corresponde a este orden")
+    return offset
+
+
+async def paginate_by_offset(find_cursor, tag: str, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None):
+    """
+    Paginación para órdenes calculados (como textScore) donde no hay clave
+    sobre la que hacer keyset. La profundidad está acotada por MAX_OFFSET.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    offset = decode_offset_cursor(cursor, tag) if cursor else 0
+    if offset >= MAX_OFFSET:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "Demasiado profundo: refina la búsqueda")
+
+    docs = await find_cursor.skip(offset).limit(limit + 1).to_list(length=limit + 1)
+
+    next_cursor = None
+    if len(docs) > limit and offset + limit < MAX_OFFSET:
+        next_cursor = encode_offset_cursor(tag, offset + limit)
+    return docs[:limit], next_cursor
@@ -0,0 +1,249 @@
+"""
+Perfilado de peticiones lentas.
+
+- Cada petición lleva un RequestProfile en un ContextVar. Las dependencias
+  decoradas con @profiled, los comandos de Mongo y la serialización anotan
+  ahí su tiempo.
+- Si la petición (cuerpo incluido) supera SLOW_REQUEST_THRESHOLD_MS se escribe una línea JSON
+  en el logger "app.slow_requests" con el desglose.
+- Un admin puede enviar la cabecera X-Profile: 1 y recibir, en lugar de la
+  respuesta, el desglose más un perfil de pila muestreado de esa petición.
+"""
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from pymongo import monitoring
+from app.core.metrics import command_collection
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SLOW_REQUEST_THRESHOLD_MS = float(os.getenv("SLOW_REQUEST_THRESHOLD_MS", "500"))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "1"))
+PROFILE_MAX_STACKS = 50
+SLOW_LOG_MAX_MONGO_CALLS = 50
+
+slow_log = logging.getLogger("app.slow_requests")
+
+_current_profile = ContextVar("request_profile", default=None)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans = {}
+        self.mongo_calls = []
+
+    def add_span(self, name: str, seconds: float):
+        count, total = self.spans.get(name, (0, 0.0))
+        self.spans[name] = (count + 1, total + seconds)
+
+    def add_mongo_call(self, collection: str, command: str, seconds: float):
+        # Lo llama el listener de pymongo desde el hilo del executor de Motor
+        self.mongo_calls.append((collection, command, seconds))
+
+    def summary(self) -> dict:
+        mongo_total = sum(seconds for _, _, seconds in self.mongo_calls)
+        return {
+            "total_ms": round((time.perf_counter() - self.start) * 1000, 2),
+            "spans": {
+                name: {"count": count, "total_ms": round(total * 1000, 2)}
+                for name, (count, total) in self.spans.items()
+            },
+            "mongo": {
+                "count": len(self.mongo_calls),
+                "total_ms": round(mongo_total * 1000, 2),
+                "calls": [
+                    {"collection": collection, "command": command, "ms": round(seconds * 1000, 2)}
+                    for collection, command, seconds in self.mongo_calls[:SLOW_LOG_MAX_MONGO_CALLS]
+                ],
+            },
+        }
+
+
+def current_profile() -> RequestProfile:
+    return _current_profile.get()
+
+
+class span:
+    """Context manager que suma el tiempo del bloque al perfil de la petición"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        profile = _current_profile.get()
+        if profile is not None:
+            profile.add_span(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def profiled(name: str):
+    """
+    Decorador para dependencias async: anota su duración en el perfil.
+    functools.wraps conserva la firma, así FastAPI sigue resolviendo sus parámetros.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class ProfileCommandListener(monitoring.CommandListener):
+    """
+    Anota cada comando de Mongo en el perfil de la petición que lo lanzó.
+    Depende de que Motor propague los contextvars al hilo que ejecuta pymongo.
+    """
+
+    def __init__(self):
+        self._pending = {}
+
+    def started(self, event):
+        profile = _current_profile.get()
+        if profile is None:
+            return
+        self._pending[(event.connection_id, event.request_id)] = (profile, command_collection(event))
+
+    def _finish(self, event):
+        pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is not None:
+            profile, collection = pending
+            profile.add_mongo_call(collection, event.command_name, event.duration_micros / 1_000_000)
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
+
+
+profile_commands = ProfileCommandListener()
+
+
+class StackSampler:
+    """
+    Muestrea la pila del hilo del event loop cada PROFILE_SAMPLE_INTERVAL_MS
+    desde un hilo aparte. Con peticiones concurrentes en el mismo worker las
+    muestras incluyen también su trabajo: usar con tráfico bajo.
+    """
+
+    def __init__(self, interval_ms: float = PROFILE_SAMPLE_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.target_thread = threading.get_ident()
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.target_thread)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_filename}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+    def collapsed(self) -> list:
+        """Pilas más frecuentes en formato "collapsed" (compatible con flamegraph)"""
+        return [
+            {"stack": stack, "samples": count}
+            for stack, count in self.samples.most_common(PROFILE_MAX_STACKS)
+        ]
+
+
+class ProfilingMiddleware:
+    """
+    Middleware ASGI puro: crea el perfil de la petición y escribe el slow log.
+    Mide hasta el último mensaje http.response.body, así las respuestas en
+    streaming (exportaciones) incluyen el envío del cuerpo y sus getMore.
+    is_admin_request(request) decide si se atiende la cabecera X-Profile.
+    """
+
+    def __init__(self, app, is_admin_request=None):
+        self.app = app
+        self.is_admin_request = is_admin_request
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        try:
+            if await self._wants_stack(scope):
+                await self._profile_stack(scope, receive, send, profile)
+                return
+
+            status_code = 500
+
+            async def send_with_status(message):
+                nonlocal status_code
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                await send(message)
+
+            await self.app(scope, receive, send_with_status)
+            summary = profile.summary()
+            if summary["total_ms"] >= SLOW_REQUEST_THRESHOLD_MS:
+                route = scope.get("route")
+                slow_log.warning(json.dumps({
+                    "method": scope["method"],
+                    "route": route.path if route is not None else scope["path"],
+                    "status": status_code,
+                    **summary,
+                }, ensure_ascii=False))
+        finally:
+            _current_profile.reset(token)
+
+    async def _wants_stack(self, scope) -> bool:
+        if self.is_admin_request is None:
+            return False
+        headers = dict(scope.get("headers") or [])
+        if headers.get(b"x-profile") != b"1":
+            return False
+        return await self.is_admin_request(Request(scope))
+
+    async def _profile_stack(self, scope, receive, send, profile):
+        # La respuesta real se descarta: el admin recibe el desglose y las pilas
+        status_code = 500
+
+        async def discard(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+
+        with StackSampler() as sampler:
+            await self.app(scope, receive, discard)
+        response = JSONResponse({
+            "status_code": status_code,
+            "timings": profile.summary(),
+            "stacks": sampler.collapsed(),
+        })
+        await response(scope, receive, send)
@@ -0,0 +1,104 @@
+"""
+Limitador de intentos para login y registro.
+
+Rechaza con 429 (y Retry-After) antes de que se ejecute bcrypt, que es lo
+caro. Las cuentas viven en un backend intercambiable: por defecto en memoria
+del worker; un backend compartido (Redis, Mongo...) solo tiene que implementar
+RateLimitBackend.hit().
+"""
+import math
+import os
+from abc import ABC, abstractmethod
+import time
+from collections import OrderedDict, deque
+from fastapi import HTTPException, Request, status
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+
+def parse_limit(value: str) -> tuple:
+    """'5/60' -> (5 intentos, 60 segundos)"""
+    attempts, seconds = value.split("/")
+    return int(attempts), float(seconds)
+
+
+class RateLimitBackend(ABC):
+    """Interfaz de almacenamiento de intentos (un backend sin hit() no se puede instanciar)"""
+
+    @abstractmethod
+    async def hit(self, key: str, limit: int, window: float) -> float:
+        """
+        Registra un intento para key. Devuelve 0 si está permitido o los
+        segundos que faltan para que vuelva a estarlo.
+        """
+
+
+class InMemorySlidingWindow(RateLimitBackend):
+    """Ventana deslizante exacta: guarda la marca de tiempo de cada intento"""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._hits = OrderedDict()
+
+    async def hit(self, key: str, limit: int, window: float) -> float:
+        now = time.monotonic()
+        hits = self._hits.get(key)
+        if hits is None:
+            hits = deque()
+            self._hits[key] = hits
+            while len(self._hits) > self.max_keys:
+                self._hits.popitem(last=False)
+        self._hits.move_to_end(key)
+
+        while hits and hits[0] <= now - window:
+            hits.popleft()
+        if len(hits) >= limit:
+            return hits[0] + window - now
+        hits.append(now)
+        return 0.0
+
+
+class RateLimiter:
+    def __init__(self, name: str, per_email: str, per_ip: str, backend: RateLimitBackend = None):
+        self.name = name
+        self.per_email = parse_limit(per_email)
+        self.per_ip = parse_limit(per_ip)
+        self.backend = backend or InMemorySlidingWindow()
+        self.allowed = 0
+        self.rejected = 0
+
+    async def check(self, request: Request, email: str):
+        """Lanza 429 si el email o la IP superaron su límite"""
+        client_ip = request.client.host if request.client else "unknown"
+        checks = (
+            (f"{self.name}:ip:{client_ip}", self.per_ip),
+            (f"{self.name}:email:{email.lower()}", self.per_email),
+        )
+        for key, (limit, window) in checks:
+            retry_after = await self.backend.hit(key, limit, window)
+            if retry_after > 0:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Demasiados intentos, espera antes de reintentar",
+                    headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+                )
+        self.allowed += 1
+
+    def stats(self) -> dict:
+        return {"allowed": self.allowed, "rejected": self.rejected}
+
+
+login_limiter = RateLimiter(
+    "login",
+    per_email=os.getenv("LOGIN_RATE_LIMIT_PER_EMAIL", "5/60"),
+    per_ip=os.getenv("LOGIN_RATE_LIMIT_PER_IP", "20/60"),
+)
+registration_limiter = RateLimiter(
+    "registration",
+    per_email=os.getenv("REGISTRATION_RATE_LIMIT_PER_EMAIL", "3/3600"),
+    per_ip=os.getenv("REGISTRATION_RATE_LIMIT_PER_IP", "10/3600"),
+)
@@ -0,0 +1,63 @@
+import hashlib
+import os
+from fastapi import Request, Response, status
+from app.core.cache import TTLCache
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "10"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or any(value.removeprefix("W/") == etag for value in candidates)
+
+
+class ResponseCache:
+    """
+    Caché de respuestas ya serializadas (bytes + ETag) para endpoints públicos.
+    La clave es la ruta con su query string; los handlers de escritura la
+    vacían con invalidate(). Entre workers la frescura la acota el TTL.
+    """
+
+    def __init__(self, maxsize: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    @staticmethod
+    def key(request: Request) -> str:
+        query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+        return f"{request.url.path}?{query}"
+
+    @staticmethod
+    def _response(request: Request, body: bytes, etag: str) -> Response:
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def lookup(self, request: Request) -> Response:
+        """Respuesta cacheada (200 o 304) o None si hay que ir a Mongo"""
+        entry = self._cache.get(self.key(request))
+        if entry is None:
+            return None
+        body, etag = entry
+        return self._response(request, body, etag)
+
+    def store(self, request: Request, body: bytes) -> Response:
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self._cache.set(self.key(request), (body, etag))
+        return self._response(request, body, etag)
+
+    def invalidate(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+products_response_cache = ResponseCache()
+business_response_cache = ResponseCache()
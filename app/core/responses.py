@@ -0,0 +1,90 @@
+"""
+Serialización rápida de respuestas.
+
+Con FAST_RESPONSES=1 los listados se serializan con orjson directamente desde
+los documentos de Mongo (ObjectId y datetime incluidos), quedándose solo con
+los campos del schema de respuesta y sin pasar por la validación de Pydantic.
+Sin la variable (o sin orjson instalado) se usa el camino normal con Pydantic.
+"""
+import json
+import os
+from datetime import date, datetime
+from bson import ObjectId
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from app.schemas.pagination import Page
+from app.core.profiling import span
+from dotenv import load_dotenv
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional
+    orjson = None
+
+load_dotenv()
+
+FAST_RESPONSES = os.getenv("FAST_RESPONSES", "0") == "1" and orjson is not None
+
+
+def _default(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(obj).__name__}")
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class ProfiledJSONResponse(JSONResponse):
+    """
+    Clase de respuesta por defecto de la app: el JSONResponse de siempre, pero
+    anota su render en el span "serialize" del perfil de la petición.
+    """
+
+    def render(self, content) -> bytes:
+        with span("serialize"):
+            return super().render(content)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse que serializa con orjson y entiende ObjectId/datetime"""
+
+    def render(self, content) -> bytes:
+        with span("serialize"):
+            return dumps(content)
+
+
+_fields_by_model = {}
+
+
+def response_fields(model) -> tuple:
+    """Claves de salida del schema (por alias, como las emite FastAPI)"""
+    fields = _fields_by_model.get(model)
+    if fields is None:
+        fields = tuple(field.alias or name for name, field in model.model_fields.items())
+        _fields_by_model[model] = fields
+    return fields
+
+
+def trusted_items(docs: list, model) -> list:
+    """Recorta documentos de Mongo a los campos del schema, sin validarlos"""
+    fields = response_fields(model)
+    return [{field: doc.get(field) for field in fields} for doc in docs]
+
+
+def render_page(docs: list, next_cursor: str, model) -> bytes:
+    """Serializa una página {items, next} por el camino rápido o por Pydantic"""
+    with span("serialize"):
+        if FAST_RESPONSES:
+            return dumps({"items": trusted_items(docs, model), "next": next_cursor})
+        page = Page[model].model_validate({"items": docs, "next": next_cursor})
+        return page.model_dump_json(by_alias=True).encode("utf-8")
+
+
+def page_response(docs: list, next_cursor: str, model) -> Response:
+    return Response(content=render_page(docs, next_cursor, model), media_type="application/json")
@@ -0,0 +1,166 @@
+"""
+Rollup de estadísticas por vendedor (colección seller_stats, clave owner_id).
+
+Guarda número de productos, unidades, valor del inventario (precio * stock),
+desglose por categoría y la lista de productos agotados. Cada escritura de
+productos aplica su diferencia con un único update_one ($inc, $addToSet,
+$pull), así el panel del vendedor es la lectura de un documento.
+
+recompute_seller_stats() rehace el rollup con una agregación y corrige
+cualquier deriva. Se usa tras el ajuste masivo (bulk_write no da
+pre-imágenes), desde el endpoint de reparación y la primera vez que se lee
+un rollup creado por un $inc sobre un vendedor que ya tenía productos.
+"""
+from collections import defaultdict
+from datetime import datetime, timezone
+from app.core.categories import category_key
+
+
+async def _apply(db, owner_id: str, inc: dict, out_of_stock_add: list = None, out_of_stock_remove: list = None):
+    update = {
+        "$set": {"updated_at": datetime.now(timezone.utc)},
+        # Un rollup nacido de un $inc no cuenta lo que había antes: se recalcula al leerlo
+        "$setOnInsert": {"needs_rebuild": True},
+    }
+    inc = {key: value for key, value in inc.items() if value}
+    if inc:
+        update["$inc"] = inc
+    if out_of_stock_add:
+        update["$addToSet"] = {"out_of_stock": {"$each": out_of_stock_add}}
+    pull = {"out_of_stock": {"product_id": {"$in": out_of_stock_remove}}} if out_of_stock_remove else None
+    if pull and "$addToSet" not in update:
+        update["$pull"] = pull
+        pull = None
+    await db["seller_stats"].update_one({"_id": owner_id}, update, upsert=True)
+    if pull:
+        # $addToSet y $pull sobre el mismo campo no pueden ir en una sola actualización
+        await db["seller_stats"].update_one({"_id": owner_id}, {"$pull": pull})
+
+
+async def on_products_added(db, owner_id: str, products: list):
+    if not products:
+        return
+    # int por defecto: contadores y unidades siguen siendo enteros, solo los valores son float
+    inc = defaultdict(int)
+    for product in products:
+        value = product["price"] * product["stock"]
+        category = category_key(product.get("category"))
+        inc["product_count"] += 1
+        inc["total_units"] += product["stock"]
+        inc["inventory_value"] += value
+        inc[f"categories.{category}.count"] += 1
+        inc[f"categories.{category}.units"] += product["stock"]
+        inc[f"categories.{category}.value"] += value
+    out_of_stock = [
+        {"product_id": str(product["_id"]), "name": product["name"]}
+        for product in products if product["stock"] == 0
+    ]
+    await _apply(db, owner_id, inc, out_of_stock_add=out_of_stock)
+
+
+async def on_product_deleted(db, product: dict):
+    value = product["price"] * product["stock"]
+    category = category_key(product.get("category"))
+    await _apply(db, product["owner_id"], {
+        "product_count": -1,
+        "total_units": -product["stock"],
+        "inventory_value": -value,
+        f"categories.{category}.count": -1,
+        f"categories.{category}.units": -product["stock"],
+        f"categories.{category}.value": -value,
+    }, out_of_stock_remove=[str(product["_id"])])
+
+
+async def on_price_changed(db, owner_id: str, product: dict, new_price: float):
+    """product es la pre-imagen (precio y stock anteriores)"""
+    delta = (new_price - product["price"]) * product["stock"]
+    category = category_key(product.get("category"))
+    await _apply(db, owner_id, {"inventory_value": delta, f"categories.{category}.value": delta})
+
+
+async def on_stock_changed(db, changes: list):
+    """
+    changes: [(post-imagen del producto, delta de unidades)] de una misma
+    reserva de checkout. Se agrupan por vendedor: una escritura por vendedor y
+    reserva, no una por ítem, para no volver a concentrar escrituras en el
+    documento del vendedor con más ventas.
+    """
+    by_owner = defaultdict(lambda: (defaultdict(int), [], []))
+    for product, delta_units in changes:
+        if not product.get("owner_id") or not delta_units:
+            continue
+        inc, out_of_stock_add, out_of_stock_remove = by_owner[product["owner_id"]]
+        value = product["price"] * delta_units
+        category = category_key(product.get("category"))
+        inc["total_units"] += delta_units
+        inc["inventory_value"] += value
+        inc[f"categories.{category}.units"] += delta_units
+        inc[f"categories.{category}.value"] += value
+        product_id = str(product["_id"])
+        if product["stock"] == 0:
+            out_of_stock_add.append({"product_id": product_id, "name": product["name"]})
+        elif product["stock"] - delta_units == 0:
+            out_of_stock_remove.append(product_id)
+
+    for owner_id, (inc, out_of_stock_add, out_of_stock_remove) in by_owner.items():
+        await _apply(db, owner_id, inc, out_of_stock_add=out_of_stock_add, out_of_stock_remove=out_of_stock_remove)
+
+
+async def recompute_seller_stats(db, owner_id: str) -> dict:
+    """Recalcula el rollup completo del vendedor con una agregación"""
+    pipeline = [
+        {"$match": {"owner_id": owner_id}},
+        {"$facet": {
+            "categories": [
+                {"$group": {
+                    "_id": "$category",
+                    "count": {"$sum": 1},
+                    "units": {"$sum": "$stock"},
+                    "value": {"$sum": {"$multiply": ["$price", "$stock"]}},
+                }},
+            ],
+            "out_of_stock": [
+                {"$match": {"stock": {"$lte": 0}}},
+                {"$project": {"_id": 0, "product_id": {"$toString": "$_id"}, "name": 1}},
+            ],
+        }},
+    ]
+    result = (await db["products"].aggregate(pipeline).to_list(length=1))[0]
+    categories = {
+        category_key(group["_id"]): {"count": group["count"], "units": group["units"], "value": group["value"]}
+        for group in result["categories"]
+    }
+    stats = {
+        "product_count": sum(category["count"] for category in categories.values()),
+        "total_units": sum(category["units"] for category in categories.values()),
+        "inventory_value": sum(category["value"] for category in categories.values()),
+        "categories": categories,
+        "out_of_stock": result["out_of_stock"],
+        "updated_at": datetime.now(timezone.utc),
+    }
+    await db["seller_stats"].replace_one({"_id": owner_id}, stats, upsert=True)
+    return stats
+
+
+async def get_seller_stats(db, owner_id: str) -> dict:
+    stats = await db["seller_stats"].find_one({"_id": owner_id})
+    if stats is None or stats.get("needs_rebuild"):
+        stats = await recompute_seller_stats(db, owner_id)
+    return stats
+
+
+def format_stats(stats: dict) -> dict:
+    categories = [
+        {"name": name, "count": values.get("count", 0), "units": values.get("units", 0),
+         "value": round(values.get("value", 0.0), 2)}
+        for name, values in (stats.get("categories") or {}).items() if values.get("count", 0) > 0
+    ]
+    categories.sort(key=lambda category: -category["count"])
+    return {
+        "product_count": stats.get("product_count", 0),
+        "total_units": stats.get("total_units", 0),
+        "inventory_value": round(stats.get("inventory_value", 0.0), 2),
+        "categories": categories,
+        "out_of_stock": stats.get("out_of_stock", []),
+        "updated_at": stats.get("updated_at"),
+    }
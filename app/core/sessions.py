@@ -0,0 +1,90 @@
+import hashlib
+import os
+from datetime import datetime, timezone
+from app.core.cache import TTLCache
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Sesiones válidas recientes y tokens revocados en memoria: la mayoría de
+# llamadas a /user/refresh no consultan la colección "sessions".
+# SESSION_CACHE_TTL acota cuánto tarda otro worker en ver una revocación.
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "30"))
+REVOKED_CACHE_TTL = float(os.getenv("REVOKED_CACHE_TTL", "300"))
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+
+
+class SessionStore:
+    """
+    Sesiones de refresh token en su propia colección, una por dispositivo.
+    La clave es el hash del token (el token nunca se guarda) y un índice TTL
+    sobre expires_at borra las caducadas.
+    """
+
+    def __init__(self):
+        self.valid = TTLCache(maxsize=SESSION_CACHE_SIZE, ttl=SESSION_CACHE_TTL)
+        self.revoked = TTLCache(maxsize=SESSION_CACHE_SIZE, ttl=REVOKED_CACHE_TTL)
+
+    @staticmethod
+    def hash_token(refresh_token: str) -> str:
+        return hashlib.sha256(refresh_token.encode("utf-8")).hexdigest()
+
+    async def create(self, db, user_id: str, refresh_token: str, expires_at: datetime, device: str = None) -> str:
+        session_id = self.hash_token(refresh_token)
+        session = {
+            "_id": session_id,
+            "user_id": str(user_id),
+            "device": device,
+            "created_at": datetime.now(timezone.utc),
+            "expires_at": expires_at,
+        }
+        await db["sessions"].insert_one(session)
+        self.valid.set(session_id, session)
+        return session_id
+
+    async def get(self, db, session_id: str) -> dict:
+        """Sesión vigente o None si no existe, caducó o fue revocada"""
+        if self.revoked.get(session_id) is not None:
+            return None
+        session = self.valid.get(session_id)
+        if session is None:
+            session = await db["sessions"].find_one({"_id": session_id})
+            if session is None:
+                self.revoked.set(session_id, True)
+                return None
+            self.valid.set(session_id, session)
+
+        # El índice TTL borra con retraso: comprobar también aquí
+        expires_at = session["expires_at"]
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        if expires_at <= datetime.now(timezone.utc):
+            return None
+        return session
+
+    def _forget(self, session_id: str):
+        self.valid.invalidate(session_id)
+        self.revoked.set(session_id, True)
+
+    async def revoke(self, db, session_id: str, user_id: str) -> bool:
+        result = await db["sessions"].delete_one({"_id": session_id, "user_id": str(user_id)})
+        if result.deleted_count:
+            self._forget(session_id)
+        return bool(result.deleted_count)
+
+    async def revoke_all(self, db, user_id: str) -> int:
+        sessions = db["sessions"].find({"user_id": str(user_id)}, {"_id": 1})
+        session_ids = [session["_id"] async for session in sessions]
+        if not session_ids:
+            return 0
+        await db["sessions"].delete_many({"_id": {"$in": session_ids}})
+        for session_id in session_ids:
+            self._forget(session_id)
+        return len(session_ids)
+
+    async def list_for_user(self, db, user_id: str) -> list:
+        cursor = db["sessions"].find({"user_id": str(user_id)}).sort("created_at", -1)
+        return await cursor.to_list(length=100)
+
+
+session_store = SessionStore()
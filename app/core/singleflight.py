@@ -0,0 +1,41 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    Agrupa lecturas idénticas concurrentes: mientras una consulta para una
+    clave está en vuelo, las demás peticiones con esa clave esperan su
+    resultado en lugar de lanzar otra. Mongo ve una consulta por clave y momento.
+
+    El resultado es el mismo objeto para todos: quien lo modifique debe copiarlo.
+    """
+
+    def __init__(self):
+        self.executed = 0
+        self.coalesced = 0
+        self._inflight = {}
+
+    async def do(self, key, fn):
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.executed += 1
+            # Tarea propia: si la petición que la lanzó se cancela, las demás siguen esperando
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        total = self.executed + self.coalesced
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+            "coalesced_ratio": round(self.coalesced / total, 4) if total else 0.0,
+        }
+
+
+product_reads = SingleFlight()
+business_reads = SingleFlight()
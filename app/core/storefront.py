@@ -0,0 +1,120 @@
+"""
+Resumen materializado por negocio (colección business_summaries).
+
+Guarda número de productos, precio mínimo/máximo y conteo por categoría.
+Las escrituras de productos lo actualizan con $inc/$min/$max; solo cuando
+sale del catálogo (o baja/sube) el producto que marcaba el mínimo o el
+máximo se recalculan los límites, con una consulta indexada por
+business_id + price. rebuild_summary() lo recalcula entero si hiciera falta.
+
+Un resumen creado por upsert desde una escritura (negocio con productos
+anteriores al resumen) nace con needs_rebuild y get_summary() lo recalcula
+en la primera lectura.
+"""
+from collections import Counter
+from datetime import datetime, timezone
+from app.core.categories import category_key
+
+
+async def refresh_price_bounds(db, business_id: str):
+    cheapest = await db["products"].find_one({"business_id": business_id}, {"price": 1}, sort=[("price", 1)])
+    priciest = await db["products"].find_one({"business_id": business_id}, {"price": 1}, sort=[("price", -1)])
+    await db["business_summaries"].update_one(
+        {"_id": business_id},
+        {"$set": {
+            "min_price": cheapest["price"] if cheapest else None,
+            "max_price": priciest["price"] if priciest else None,
+            "updated_at": datetime.now(timezone.utc),
+        }, "$setOnInsert": {"needs_rebuild": True}},
+        upsert=True
+    )
+
+
+async def on_products_added(db, business_id: str, products: list):
+    if not products:
+        return
+    prices = [product["price"] for product in products]
+    categories = Counter(category_key(product.get("category")) for product in products)
+    update = {
+        "$inc": {"product_count": len(products)},
+        "$min": {"min_price": min(prices)},
+        "$max": {"max_price": max(prices)},
+        "$set": {"updated_at": datetime.now(timezone.utc)},
+        # Sin resumen previo el $inc partiría de 0: se recalcula al leerlo
+        "$setOnInsert": {"needs_rebuild": True},
+    }
+    for category, count in categories.items():
+        update["$inc"][f"categories.{category}"] = count
+    await db["business_summaries"].update_one({"_id": business_id}, update, upsert=True)
+
+
+async def on_product_deleted(db, product: dict):
+    business_id = product.get("business_id")
+    if not business_id:
+        return
+    summary = await db["business_summaries"].find_one_and_update(
+        {"_id": business_id},
+        {"$inc": {"product_count": -1, f"categories.{category_key(product.get('category'))}": -1}},
+        projection={"min_price": 1, "max_price": 1}
+    )
+    if summary and product.get("price") in (summary.get("min_price"), summary.get("max_price")):
+        await refresh_price_bounds(db, business_id)
+
+
+async def on_product_price_changed(db, business_id: str, old_price: float, new_price: float):
+    if not business_id or old_price == new_price:
+        return
+    summary = await db["business_summaries"].find_one_and_update(
+        {"_id": business_id},
+        {"$min": {"min_price": new_price}, "$max": {"max_price": new_price}},
+        projection={"min_price": 1, "max_price": 1}
+    )
+    # Si el producto era el más barato/caro y se alejó del extremo, recalcular
+    if summary and old_price in (summary.get("min_price"), summary.get("max_price")):
+        await refresh_price_bounds(db, business_id)
+
+
+async def rebuild_summary(db, business_id: str) -> dict:
+    """Recalcula el resumen desde cero con una agregación (reparación)"""
+    pipeline = [
+        {"$match": {"business_id": business_id}},
+        {"$group": {
+            "_id": "$category",
+            "count": {"$sum": 1},
+            "min_price": {"$min": "$price"},
+            "max_price": {"$max": "$price"},
+        }},
+    ]
+    groups = await db["products"].aggregate(pipeline).to_list(length=None)
+    summary = {
+        "product_count": sum(group["count"] for group in groups),
+        "min_price": min((group["min_price"] for group in groups), default=None),
+        "max_price": max((group["max_price"] for group in groups), default=None),
+        "categories": {category_key(group["_id"]): group["count"] for group in groups},
+        "updated_at": datetime.now(timezone.utc),
+    }
+    await db["business_summaries"].replace_one({"_id": business_id}, summary, upsert=True)
+    return summary
+
+
+async def get_summary(db, business_id: str, read_db=None) -> dict:
+    """Lee el resumen (de read_db si se indica) y lo recalcula en db si falta o está marcado"""
+    summary = await (read_db if read_db is not None else db)["business_summaries"].find_one({"_id": business_id})
+    if summary is None or summary.get("needs_rebuild"):
+        summary = await rebuild_summary(db, business_id)
+    return summary
+
+
+def format_summary(summary: dict) -> dict:
+    summary = summary or {}
+    categories = [
+        {"name": name, "count": count}
+        for name, count in (summary.get("categories") or {}).items() if count > 0
+    ]
+    categories.sort(key=lambda category: -category["count"])
+    return {
+        "product_count": max(summary.get("product_count", 0), 0),
+        "min_price": summary.get("min_price"),
+        "max_price": summary.get("max_price"),
+        "categories": categories,
+    }
@@ -1,24 +1,155 @@
 from motor.motor_asyncio import AsyncIOMotorClient
-import os 
+from pymongo import monitoring
+from pymongo.read_preferences import SecondaryPreferred
+from app.core.metrics import command_timing
+from app.core.profiling import profile_commands, profiled
+import os
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
 
 URL = os.getenv("MONGODB_URL")
+DB_NAME = "ecommerce"
 
+# Configuración del pool de conexiones (una instancia por worker)
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "0"))
+MONGODB_MAX_IDLE_TIME_MS = int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", "60000"))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+# Retraso máximo tolerado en las lecturas de catálogo desde secundarios (Mongo exige >= 90 s)
+MONGODB_MAX_STALENESS_S = int(os.getenv("MONGODB_MAX_STALENESS_S", "90"))
 
-# client = AsyncIOMotorClient(URL)
-# database = client.ecommerce
 
-# def get_db():
-#     """Retorna la base de datos para usar en dependencias"""
-#     return database
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """
+    Listener de pymongo que lleva la cuenta del estado del pool.
+    Sirve para dimensionar MONGODB_MAX_POOL_SIZE con datos reales.
+    pymongo llama a los hooks desde varios hilos del executor de Motor a la
+    vez: los contadores se actualizan bajo un lock para no perder eventos.
+    """
 
-async def get_db():
-    client = AsyncIOMotorClient(URL)
-    db = client.ecommerce
-    try:
-        yield db
-    finally:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.created = 0
+        self.closed = 0
+        self.checked_out = 0
+        self.waiting = 0
+        self.checkout_failed = 0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.closed += 1
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self.waiting += 1
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.waiting -= 1
+            self.checkout_failed += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.waiting -= 1
+            self.checked_out += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checked_out": self.checked_out,
+                "waiting": self.waiting,
+                "created": self.created,
+                "closed": self.closed,
+                "open": self.created - self.closed,
+                "checkout_failed": self.checkout_failed,
+                "max_pool_size": MONGODB_MAX_POOL_SIZE,
+            }
+
+
+pool_stats = PoolStatsListener()
+
+# Cliente compartido por todo el worker. Lo crea y lo cierra el lifespan de app.main
+client: AsyncIOMotorClient = None
+database = None
+# Mismo cliente, pero leyendo de secundarios si los hay (solo catálogo público)
+read_database = None
+
+
+def connect_to_mongo():
+    """Crea el cliente único del worker con su pool de conexiones"""
+    global client, database, read_database
+    if client is not None:
+        return client
+    client = AsyncIOMotorClient(
+        URL,
+        maxPoolSize=MONGODB_MAX_POOL_SIZE,
+        minPoolSize=MONGODB_MIN_POOL_SIZE,
+        maxIdleTimeMS=MONGODB_MAX_IDLE_TIME_MS,
+        serverSelectionTimeoutMS=MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        event_listeners=[pool_stats, command_timing, profile_commands],
+    )
+    database = client[DB_NAME]
+    read_database = client.get_database(
+        DB_NAME,
+        read_preference=SecondaryPreferred(max_staleness=MONGODB_MAX_STALENESS_S),
+    )
+    return client
+
+
+def close_mongo_connection():
+    """Cierra el cliente del worker (se llama al apagar la app)"""
+    global client, database, read_database
+    if client is not None:
         client.close()
+    client = None
+    database = None
+    read_database = None
+
+
+def get_pool_stats() -> dict:
+    return pool_stats.snapshot()
+
+
+@profiled("get_db")
+async def get_db():
+    """Retorna la base de datos compartida para usar en dependencias"""
+    if database is None:
+        raise RuntimeError("MongoDB no está inicializado: falta el lifespan de la app")
+    return database
+
 
+@profiled("get_read_db")
+async def get_read_db():
+    """
+    Base de datos para lecturas de catálogo que toleran cierto retraso:
+    secondaryPreferred con max staleness. Escrituras, autenticación y
+    cualquier lectura que deba ver la propia escritura usan get_db (primario).
+    """
+    if read_database is None:
+        raise RuntimeError("MongoDB no está inicializado: falta el lifespan de la app")
+    return read_database
@@ -1,12 +1,80 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from .routers import users, business, products
+from fastapi.responses import PlainTextResponse
+from .database import connect_to_mongo, close_mongo_connection, get_pool_stats, get_db
+from .core.hashing import hashing_engine
+from .core.indexes import ensure_indexes, check_query_plans, MONGODB_CHECK_QUERY_PLANS
+from .core.metrics import MetricsMiddleware, render_metrics, register_cache, register_stats
+from .core.auth import principal_cache
+from .core.depends import token_version_cache, is_admin_request
+from .core.profiling import ProfilingMiddleware
+from .core.responses import ProfiledJSONResponse
+from .core.inventory import reservation_reaper
+from .core.sessions import session_store
+from .core.response_cache import products_response_cache, business_response_cache
+from .core.rate_limit import login_limiter, registration_limiter
+from .core.singleflight import product_reads, business_reads
+from .core.facets import facets_cache, facet_reads
+from .routers import users, business, products, checkout
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # El pool de hashing antes que Motor: sus procesos no deben heredar los hilos del cliente
+    hashing_engine.start()
+    # Un solo cliente de Mongo por worker, reutilizado por todas las peticiones
+    connect_to_mongo()
+    db = await get_db()
+    await ensure_indexes(db)
+    if MONGODB_CHECK_QUERY_PLANS:
+        failures = await check_query_plans(db)
+        if failures:
+            raise RuntimeError(f"Consultas sin índice (COLLSCAN): {failures}")
+    reaper = asyncio.create_task(reservation_reaper(get_db))
+    yield
+    reaper.cancel()
+    hashing_engine.shutdown()
+    close_mongo_connection()
+
+
+# Todas las respuestas JSON anotan su serialización en el perfil de la petición
+app = FastAPI(lifespan=lifespan, default_response_class=ProfiledJSONResponse)
+app.add_middleware(MetricsMiddleware)
+
+# Slow log y perfil de pila bajo demanda (cabecera X-Profile, solo admin)
+app.add_middleware(ProfilingMiddleware, is_admin_request=is_admin_request)
+
+register_cache("principal", principal_cache)
+register_cache("token_version", token_version_cache)
+register_cache("sessions_valid", session_store.valid)
+register_cache("sessions_revoked", session_store.revoked)
+register_cache("products_response", products_response_cache)
+register_cache("business_response", business_response_cache)
+register_cache("product_facets", facets_cache)
+register_stats("mongo_pool", get_pool_stats)
+register_stats("hashing", hashing_engine.stats)
+register_stats("login_limiter", login_limiter.stats)
+register_stats("registration_limiter", registration_limiter.stats)
+register_stats("singleflight_products", product_reads.stats)
+register_stats("singleflight_business", business_reads.stats)
+register_stats("singleflight_facets", facet_reads.stats)
 
 app.include_router(users.router)
 app.include_router(business.router)
 app.include_router(products.router)
+app.include_router(checkout.router)
 
 @app.get("/")
 def read_root():
-    return {"Hello": "World"}
\ No newline at end of file
+    return {"Hello": "World"}
+
+@app.get("/db/pool-stats")
+def read_pool_stats():
+    """Estadísticas del pool de conexiones de MongoDB de este worker"""
+    return get_pool_stats()
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def read_metrics():
+    """Métricas del worker en formato de texto de Prometheus"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -1,10 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from bson import ObjectId
+from pymongo import ReturnDocument
 from datetime import datetime, timezone
-from app.database import get_db
-from app.core.depends import (get_current_user,verify_business_ownership, require_seller)
-from app.schemas.business import BusinessCreate, BusinessResponse, BusinessUpdate # Asegúrate de tener estos schemas
+from app.database import get_db, get_read_db
+from app.core.depends import (get_current_user, require_seller, revoke_tokens,
+                              parse_object_id, raise_not_found_or_forbidden)
+from app.core.pagination import paginate, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.core.response_cache import business_response_cache
+from app.core.responses import render_page
+from app.core.singleflight import business_reads
+from app.core.storefront import get_summary, format_summary
+from app.schemas.products import PRODUCT_RESPONSE_PROJECTION
+from app.schemas.business import BusinessCreate, BusinessResponse, BusinessUpdate, BusinessSortField, BUSINESS_RESPONSE_PROJECTION, StorefrontResponse # Asegúrate de tener estos schemas
+from app.schemas.pagination import Page, SortOrder
 
 router = APIRouter(
     prefix="/business",
@@ -20,6 +28,7 @@ async def add_business(request: BusinessCreate, db = Depends(get_db), current_us
     # Vinculamos el negocio al usuario que tiene la sesión activa
     
     result = await db["businesses"].insert_one(new_business)
+    business_response_cache.invalidate()
 
 
     # Actualizar el rol
@@ -28,66 +37,135 @@ async def add_business(request: BusinessCreate, db = Depends(get_db), current_us
             {"_id": ObjectId(current_user["_id"])},
             {"$set": {"role": "seller"}}
         )
+        # El token actual dice "customer": el cliente debe usar /user/refresh
+        await revoke_tokens(db, current_user)
         
 
     # Recuperamos y formateamos el resultado para evitar errores de tipo con el _id
-    created_business = await db["businesses"].find_one({"_id": result.inserted_id})
+    created_business = await db["businesses"].find_one({"_id": result.inserted_id}, BUSINESS_RESPONSE_PROJECTION)
     created_business["_id"] = str(created_business["_id"])
     return created_business
 
-@router.get("/get", response_model=List[BusinessResponse])
-async def get_all_businesses(db = Depends(get_db)):
-    # Recuperamos todos los negocios registrados en el sistema
-    businesses_cursor = db["businesses"].find()
-    businesses = await businesses_cursor.to_list(length=100)
+@router.get("/get", response_model=Page[BusinessResponse])
+async def get_all_businesses(
+    http_request: Request,
+    db = Depends(get_read_db),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = None,
+    sort: BusinessSortField = BusinessSortField.ID,
+    order: SortOrder = SortOrder.ASC
+):
+    # Listado público: se sirve desde la caché de respuestas (ETag/304) si está fresca
+    cached = business_response_cache.lookup(http_request)
+    if cached is not None:
+        return cached
+
+    # Recuperamos los negocios registrados, una página cada vez
+    sort_field = "_id" if sort == BusinessSortField.ID else sort.value
+    businesses, next_cursor = await paginate(
+        db["businesses"], {}, sort_field, order.value, limit, cursor, BUSINESS_RESPONSE_PROJECTION
+    )
     
     for biz in businesses:
         biz["_id"] = str(biz["_id"])
-    return businesses
+    return business_response_cache.store(http_request, render_page(businesses, next_cursor, BusinessResponse))
 
 
 @router.put("/update/{business_id}", response_model=BusinessResponse)
-async def update_business(business_id:str,request: BusinessUpdate ,db = Depends(get_db), current_user = Depends(require_seller), _ = Depends(verify_business_ownership())):
+async def update_business(business_id:str,request: BusinessUpdate ,db = Depends(get_db), current_user = Depends(require_seller)):
 
-    business = await db["businesses"].find_one({"_id": ObjectId(business_id)})
-
-
-    if not business:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Negocio no encontrado")
-    
-    if business["owner_id"] != str(current_user["_id"]):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, 
-            detail="No tienes permisos para modificar este negocio"
-        )
+    object_id = parse_object_id(business_id, "ID de negocio inválido")
+    # El filtro por owner_id hace la verificación de propiedad en la misma operación
+    ownership_filter = {"_id": object_id, "owner_id": str(current_user["_id"])}
 
     updated_data = {k: v for k, v in request.model_dump().items() if v is not None}
     if updated_data:
         updated_data["updated_at"] = datetime.now(timezone.utc)
+        updated_business = await db["businesses"].find_one_and_update(
+            ownership_filter,
+            {"$set": updated_data},
+            projection=BUSINESS_RESPONSE_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+    else:
+        updated_business = await db["businesses"].find_one(ownership_filter, BUSINESS_RESPONSE_PROJECTION)
 
+    if not updated_business:
+        await raise_not_found_or_forbidden(
+            db["businesses"], object_id,
+            "Negocio no encontrado", "No tienes permisos para modificar este negocio"
+        )
+    business_response_cache.invalidate()
 
-    await db["businesses"].update_one({"_id": ObjectId(business_id)}, {"$set": updated_data})
-
-    updated_business = await db["businesses"].find_one({"_id": ObjectId(business_id)})
     updated_business["_id"] = str(updated_business["_id"])
     return updated_business
 
 
 # 3. Eliminar un negocio (DELETE /business/delete/{id})
 @router.delete("/delete/{business_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_business(business_id: str, db = Depends(get_db), current_user = Depends(get_current_user), _ = Depends(verify_business_ownership())):
-    # Buscamos el negocio por su ID de MongoDB
-    business = await db["businesses"].find_one({"_id": ObjectId(business_id)})
+async def delete_business(business_id: str, db = Depends(get_db), current_user = Depends(get_current_user)):
+    object_id = parse_object_id(business_id, "ID de negocio inválido")
+
+    # Solo el dueño puede borrar su negocio: borrado y verificación en una sola operación
+    deleted_business = await db["businesses"].find_one_and_delete(
+        {"_id": object_id, "owner_id": str(current_user["_id"])},
+        projection={"_id": 1}
+    )
     
+    if not deleted_business:
+        await raise_not_found_or_forbidden(
+            db["businesses"], object_id,
+            "Negocio no encontrado", "No tienes permisos para eliminar este negocio"
+        )
+    business_response_cache.invalidate()
+    await db["business_summaries"].delete_one({"_id": business_id})
+
+    return {"message": "Negocio eliminado correctamente"}
+
+
+# 4. Storefront: negocio + resumen materializado + productos paginados (GET /business/{id}/storefront)
+@router.get("/{business_id}/storefront", response_model=StorefrontResponse)
+async def get_storefront(
+    business_id: str,
+    db = Depends(get_read_db),
+    write_db = Depends(get_db),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = None,
+    order: SortOrder = SortOrder.ASC
+):
+    object_id = parse_object_id(business_id, "ID de negocio inválido")
+    business = await business_reads.do(
+        ("business", business_id),
+        lambda: db["businesses"].find_one({"_id": object_id}, BUSINESS_RESPONSE_PROJECTION)
+    )
+    if not business:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Negocio no encontrado")
+
+    # Los agregados salen del resumen que mantienen las escrituras, no de un $lookup
+    summary = await get_summary(write_db, business_id, read_db=db)
+    products, next_cursor = await paginate(
+        db["products"], {"business_id": business_id}, "price", order.value, limit, cursor, PRODUCT_RESPONSE_PROJECTION
+    )
+
+    business = dict(business)
+    business["_id"] = str(business["_id"])
+    for product in products:
+        product["_id"] = str(product["_id"])
+    return {"business": business, "summary": format_summary(summary), "products": products, "next": next_cursor}
+
+
+# 5. Obtener un negocio (GET /business/{id}). Va la última para no tapar /get
+@router.get("/{business_id}", response_model=BusinessResponse)
+async def get_business(business_id: str, db = Depends(get_read_db)):
+    object_id = parse_object_id(business_id, "ID de negocio inválido")
+    # Peticiones simultáneas del mismo negocio comparten una sola consulta
+    business = await business_reads.do(
+        ("business", business_id),
+        lambda: db["businesses"].find_one({"_id": object_id}, BUSINESS_RESPONSE_PROJECTION)
+    )
     if not business:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Negocio no encontrado")
-    
-    # Verificación de seguridad: solo el dueño puede borrar su negocio
-    if business["owner_id"] != str(current_user["_id"]):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, 
-            detail="No tienes permisos para eliminar este negocio"
-        )
 
-    await db["businesses"].delete_one({"_id": ObjectId(business_id)})
-    return {"message": "Negocio eliminado correctamente"}
\ No newline at end of file
+    business = dict(business)
+    business["_id"] = str(business["_id"])
+    return business
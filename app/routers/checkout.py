@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends, status
+from datetime import datetime, timezone
+from app.database import get_db
+from app.core.depends import require_customer, parse_object_id
+from app.core.inventory import reserve_items, complete_reservation, cancel_reservation
+from app.schemas.checkout import ReservationCreate, ReservationResponse, OrderResponse
+
+router = APIRouter(
+    prefix="/checkout",
+    tags=["Checkout"]
+)
+
+@router.post("/reserve", response_model=ReservationResponse, status_code=status.HTTP_201_CREATED)
+async def reserve_cart(request: ReservationCreate, db = Depends(get_db), current_user = Depends(require_customer)):
+    """
+    Reserva el stock de todo el carrito o de nada. La reserva caduca si no se
+    confirma a tiempo y entonces el stock vuelve al producto.
+    """
+    reservation = await reserve_items(db, current_user["_id"], [item.model_dump() for item in request.items])
+    reservation["_id"] = str(reservation["_id"])
+    return reservation
+
+@router.post("/{reservation_id}/confirm", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
+async def confirm_reservation(reservation_id: str, db = Depends(get_db), current_user = Depends(require_customer)):
+    object_id = parse_object_id(reservation_id, "ID de reserva inválido")
+    reservation = await complete_reservation(db, object_id, current_user["_id"])
+
+    # El stock ya se descontó al reservar: el pedido solo lo registra
+    order = {
+        "user_id": reservation["user_id"],
+        "reservation_id": reservation_id,
+        "items": reservation["items"],
+        "total": reservation["total"],
+        "created_at": datetime.now(timezone.utc),
+    }
+    result = await db["orders"].insert_one(order)
+    order["_id"] = str(result.inserted_id)
+    return order
+
+@router.delete("/{reservation_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def cancel_cart(reservation_id: str, db = Depends(get_db), current_user = Depends(require_customer)):
+    object_id = parse_object_id(reservation_id, "ID de reserva inválido")
+    await cancel_reservation(db, object_id, current_user["_id"])
@@ -1,10 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from bson import ObjectId
-from app.database import get_db
-from app.core.depends import (get_current_user, verify_product_ownership, require_seller, require_customer)
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+from pydantic import ValidationError
+from app.database import get_db, get_read_db
+from app.core.depends import (get_current_user, require_seller, require_customer, require_admin,
+                              parse_object_id, raise_not_found_or_forbidden)
+from app.core.export import ExportFormat, stream_export
+from app.core.response_cache import products_response_cache
+from app.core.responses import render_page, page_response, FastJSONResponse, FAST_RESPONSES
+from app.core.singleflight import product_reads
+from app.core.storefront import on_products_added, on_product_deleted, on_product_price_changed, refresh_price_bounds
+from app.core import seller_stats
+from app.core.facets import get_facets
+from app.core.imports import iter_import_rows, format_validation_error, IMPORT_CHUNK_SIZE, MAX_REPORTED_ERRORS
 from datetime import datetime, timezone
-from app.schemas.products import ProductCreate, ProductUpdate, ProductResponse
+from app.core.pagination import paginate, paginate_by_offset, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.schemas.products import (ProductCreate, ProductUpdate, ProductResponse, ProductSortField, ProductSearchSort, BulkImportResult,
+                                  BulkAdjustRequest, BulkAdjustResult, SellerStatsResponse, ProductFacetsResponse,
+                                  PRODUCT_RESPONSE_PROJECTION, PRODUCT_OWNER_PROJECTION)
+from app.schemas.pagination import Page, SortOrder
 
 router = APIRouter(
     prefix="/products",
@@ -16,7 +31,7 @@ async def add_product(request: ProductCreate, db = Depends(get_db), current_user
     # Verificamos que el negocio (business_id) exista y pertenezca al usuario
     business = await db["businesses"].find_one({
         "owner_id": str(current_user["_id"])
-    })
+    }, {"_id": 1, "owner_id": 1})
 
     
     if not business:
@@ -37,79 +52,368 @@ async def add_product(request: ProductCreate, db = Depends(get_db), current_user
     
     
     result = await db["products"].insert_one(new_product)
-    created_product = await db["products"].find_one({"_id": result.inserted_id})
+    await on_products_added(db, new_product["business_id"], [new_product])
+    await seller_stats.on_products_added(db, new_product["owner_id"], [new_product])
+    created_product = await db["products"].find_one({"_id": result.inserted_id}, PRODUCT_RESPONSE_PROJECTION)
+    products_response_cache.invalidate()
     
     # Convertimos el ID para evitar el error de serialización JSON 
     created_product["_id"] = str(created_product["_id"])
     return created_product
 
-@router.get("/get", response_model=List[ProductResponse])
-async def get_all_products(db = Depends(get_db)):
-    # Recupera todos los productos sin necesidad de autenticación (catálogo público)
-    products_cursor = db["products"].find()
-    products = await products_cursor.to_list(length=100)
+@router.post("/bulk", response_model=BulkImportResult)
+async def bulk_import_products(
+    upload: Request,
+    db = Depends(get_db),
+    current_user = Depends(require_seller),
+    format: ExportFormat = None
+):
+    """
+    Importación masiva de productos desde un upload NDJSON o CSV (cuerpo en streaming).
+    Las filas se validan con ProductCreate y se insertan por lotes con insert_many
+    desordenado: una fila mala no aborta el resto, se informa en "errors".
+    """
+    owner_id = str(current_user["_id"])
+    business = await db["businesses"].find_one({"owner_id": owner_id}, {"_id": 1})
+    if not business:
+        raise HTTPException(status_code=404, detail="El negocio especificado no existe")
+
+    if format is None:
+        content_type = upload.headers.get("content-type", "")
+        format = ExportFormat.CSV if "csv" in content_type else ExportFormat.NDJSON
+
+    result = {"inserted": 0, "failed": 0, "errors": [], "errors_truncated": False}
+
+    def add_error(row: int, message: str):
+        result["failed"] += 1
+        if len(result["errors"]) < MAX_REPORTED_ERRORS:
+            result["errors"].append({"row": row, "error": message})
+        else:
+            result["errors_truncated"] = True
+
+    async def flush(batch: list, rows: list):
+        failed_indexes = set()
+        try:
+            inserted = await db["products"].insert_many(batch, ordered=False)
+            result["inserted"] += len(inserted.inserted_ids)
+        except BulkWriteError as e:
+            result["inserted"] += e.details.get("nInserted", 0)
+            for write_error in e.details.get("writeErrors", []):
+                failed_indexes.add(write_error["index"])
+                add_error(rows[write_error["index"]], write_error.get("errmsg", "Error de escritura"))
+        inserted_products = [product for index, product in enumerate(batch) if index not in failed_indexes]
+        await on_products_added(db, str(business["_id"]), inserted_products)
+        await seller_stats.on_products_added(db, owner_id, inserted_products)
+
+    batch, rows = [], []
+    async for row_number, row in iter_import_rows(upload.stream(), format):
+        if isinstance(row, str):
+            add_error(row_number, row)
+            continue
+        try:
+            product = ProductCreate(**row)
+        except ValidationError as e:
+            add_error(row_number, format_validation_error(e))
+            continue
+        if product.stock == 0:
+            add_error(row_number, "Stock mínimo: 1 unidad")
+            continue
+
+        now = datetime.now(timezone.utc)
+        new_product = product.model_dump()
+        new_product["owner_id"] = owner_id
+        new_product["business_id"] = str(business["_id"])
+        new_product["created_at"] = now
+        new_product["update_at"] = now
+        batch.append(new_product)
+        rows.append(row_number)
+
+        if len(batch) >= IMPORT_CHUNK_SIZE:
+            await flush(batch, rows)
+            batch, rows = [], []
+
+    if batch:
+        await flush(batch, rows)
+
+    if result["inserted"]:
+        products_response_cache.invalidate()
+    return result
+
+@router.post("/bulk-adjust", response_model=BulkAdjustResult)
+async def bulk_adjust_products(
+    request: BulkAdjustRequest,
+    db = Depends(get_db),
+    current_user = Depends(require_seller)
+):
+    """
+    Ajuste masivo de precio y stock de productos propios en un solo bulk_write.
+    stock_delta negativo nunca deja el stock por debajo de 0: ese ítem falla.
+    """
+    owner_id = str(current_user["_id"])
+    # Marca de esta operación: permite saber qué ítems se aplicaron si algo falla
+    adjustment_id = ObjectId()
+    now = datetime.now(timezone.utc)
+
+    operations, failures, object_ids = [], [], {}
+    for item in request.items:
+        if not ObjectId.is_valid(item.product_id):
+            failures.append({"product_id": item.product_id, "error": "ID de producto inválido"})
+            continue
+        object_id = ObjectId(item.product_id)
+        object_ids[object_id] = item
+
+        query = {"_id": object_id, "owner_id": owner_id}
+        update = {"$set": {"updated_at": now, "last_adjustment_id": adjustment_id}}
+        if item.price is not None:
+            update["$set"]["price"] = item.price
+        if item.stock_set is not None:
+            update["$set"]["stock"] = item.stock_set
+        if item.stock_delta is not None:
+            update["$inc"] = {"stock": item.stock_delta}
+            if item.stock_delta < 0:
+                query["stock"] = {"$gte": -item.stock_delta}
+        operations.append(UpdateOne(query, update))
+
+    if not operations:
+        return {"matched": 0, "modified": 0, "failures": failures}
+
+    result = await db["products"].bulk_write(operations, ordered=False)
+    if result.modified_count:
+        products_response_cache.invalidate()
+        if any(item.price is not None for item in request.items):
+            # Los precios cambiaron: recalcular mínimo/máximo de los storefronts del vendedor
+            async for business in db["businesses"].find({"owner_id": owner_id}, {"_id": 1}):
+                await refresh_price_bounds(db, str(business["_id"]))
+        # Sin pre-imágenes no hay diferencias que sumar: una agregación por lote
+        await seller_stats.recompute_seller_stats(db, owner_id)
+
+    # Solo si algún ítem no se aplicó se averigua cuál y por qué
+    if result.matched_count < len(operations):
+        applied = db["products"].find(
+            {"_id": {"$in": list(object_ids)}},
+            {"owner_id": 1, "last_adjustment_id": 1}
+        )
+        found = {doc["_id"]: doc async for doc in applied}
+        for object_id, item in object_ids.items():
+            doc = found.get(object_id)
+            if doc is None or doc.get("owner_id") != owner_id:
+                failures.append({"product_id": item.product_id, "error": "Producto no encontrado o no eres dueño"})
+            elif doc.get("last_adjustment_id") != adjustment_id:
+                failures.append({"product_id": item.product_id, "error": "Stock insuficiente"})
+
+    return {"matched": result.matched_count, "modified": result.modified_count, "failures": failures}
+
+@router.get("/get", response_model=Page[ProductResponse])
+async def get_all_products(
+    http_request: Request,
+    db = Depends(get_read_db),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = None,
+    sort: ProductSortField = ProductSortField.ID,
+    order: SortOrder = SortOrder.ASC
+):
+    # Catálogo público: se sirve desde la caché de respuestas (ETag/304) si está fresca
+    cached = products_response_cache.lookup(http_request)
+    if cached is not None:
+        return cached
+
+    # Paginado por cursor; "next" trae el cursor de la siguiente página
+    sort_field = "_id" if sort == ProductSortField.ID else sort.value
+    products, next_cursor = await paginate(
+        db["products"], {}, sort_field, order.value, limit, cursor, PRODUCT_RESPONSE_PROJECTION
+    )
     
     for product in products:
         product["_id"] = str(product["_id"])
-    return products
+    return products_response_cache.store(http_request, render_page(products, next_cursor, ProductResponse))
+
+@router.get("/search", response_model=Page[ProductResponse])
+async def search_products(
+    db = Depends(get_read_db),
+    q: str = Query(None, max_length=200),
+    category: str = Query(None, max_length=50),
+    min_price: float = Query(None, ge=0),
+    max_price: float = Query(None, ge=0),
+    sort: ProductSearchSort = ProductSearchSort.RELEVANCE,
+    order: SortOrder = SortOrder.ASC,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = None
+):
+    """
+    Búsqueda pública en el catálogo: texto en name/description (índice de texto)
+    y filtros por categoría y rango de precio (índice category+price).
+    """
+    query = {}
+    if q and q.strip():
+        query["$text"] = {"$search": q.strip()}
+    if category:
+        query["category"] = category
+    if min_price is not None or max_price is not None:
+        query["price"] = {}
+        if min_price is not None:
+            query["price"]["$gte"] = min_price
+        if max_price is not None:
+            query["price"]["$lte"] = max_price
+
+    if sort == ProductSearchSort.RELEVANCE and "$text" in query:
+        # textScore no admite keyset: paginación por offset acotada
+        score = {"$meta": "textScore"}
+        find_cursor = db["products"].find(
+            query, {**PRODUCT_RESPONSE_PROJECTION, "score": score}
+        ).sort([("score", score), ("_id", 1)])
+        products, next_cursor = await paginate_by_offset(find_cursor, "relevance", limit, cursor)
+    else:
+        # Sin texto la relevancia no aplica: orden por precio
+        products, next_cursor = await paginate(
+            db["products"], query, "price", order.value, limit, cursor, PRODUCT_RESPONSE_PROJECTION
+        )
+
+    for product in products:
+        product["_id"] = str(product["_id"])
+    return page_response(products, next_cursor, ProductResponse)
+
+@router.get("/facets", response_model=ProductFacetsResponse)
+async def get_product_facets(
+    db = Depends(get_read_db),
+    q: str = Query(None, max_length=200),
+    category: str = Query(None, max_length=50),
+    min_price: float = Query(None, ge=0),
+    max_price: float = Query(None, ge=0)
+):
+    """
+    Conteo por categoría e histograma de precios del catálogo, con los mismos
+    filtros que /search (el rango de precio se ajusta a los límites de los
+    tramos del histograma). Se sirve de una caché corta de la agregación $facet.
+    """
+    return await get_facets(db["products"], q, category, min_price, max_price)
 
 @router.get("/my-products")
 async def get_my_products(
     db = Depends(get_db),
-    current_user = Depends(require_seller)  # Solo vendedores acceden
+    current_user = Depends(require_seller),  # Solo vendedores acceden
+    format: ExportFormat = None
 ):
     """
     Endpoint que devuelve TODOS los productos creados por el usuario autenticado.
+    Con ?format=ndjson o ?format=csv la respuesta se envía en streaming.
     """
+    query = {"owner_id": str(current_user["_id"])}
+    if format is not None:
+        return stream_export(db["products"], query, format, "my-products")
+
     # Filtramos la búsqueda en la colección 'products' por el ID del dueño
-    cursor = db["products"].find({"owner_id": str(current_user["_id"])})
+    cursor = db["products"].find(query, PRODUCT_OWNER_PROJECTION)
     
     # Convertimos el cursor a una lista
     products_list = await cursor.to_list(length=None)
     
+    if FAST_RESPONSES:
+        return FastJSONResponse(products_list)
+
     # Convertimos los ObjectId a string para la respuesta JSON
     for product in products_list:
         product["_id"] = str(product["_id"])
     
     return products_list
 
+@router.get("/my-stats", response_model=SellerStatsResponse)
+async def get_my_stats(db = Depends(get_db), current_user = Depends(require_seller)):
+    """Panel del vendedor: valor del inventario, productos por categoría y agotados"""
+    stats = await seller_stats.get_seller_stats(db, str(current_user["_id"]))
+    return seller_stats.format_stats(stats)
+
+@router.post("/my-stats/rebuild", response_model=SellerStatsResponse)
+async def rebuild_my_stats(db = Depends(get_db), current_user = Depends(require_seller)):
+    """Recalcula el rollup del vendedor desde los productos (corrige deriva)"""
+    stats = await seller_stats.recompute_seller_stats(db, str(current_user["_id"]))
+    return seller_stats.format_stats(stats)
+
+@router.get("/export")
+async def export_all_products(
+    db = Depends(get_read_db),
+    _ = Depends(require_admin),
+    format: ExportFormat = ExportFormat.NDJSON
+):
+    """Exporta todo el catálogo en streaming (solo admin)"""
+    return stream_export(db["products"], {}, format, "products")
+
 # 3. Actualizar un producto (PUT /products/update/{id})
 @router.put("/update/{product_id}", response_model=ProductResponse)
 async def update_product( 
     product_id: str,
     request: ProductUpdate,
     db = Depends(get_db),
-    current_user = Depends(require_seller),
-     _ = Depends(verify_product_ownership())
+    current_user = Depends(require_seller)
 ):
-    product = await db["products"].find_one({"_id": ObjectId(product_id)})
-
-    
-    if not product or product["owner_id"] != str(current_user["_id"]):
-        raise HTTPException(status_code=403, detail="No autorizado para editar este producto")
+    object_id = parse_object_id(product_id, "ID de producto inválido")
+    # El filtro por owner_id hace la verificación de propiedad en la misma operación
+    ownership_filter = {"_id": object_id, "owner_id": str(current_user["_id"])}
 
     updated_data = {k: v for k, v in request.model_dump().items() if v is not None}
     
     if updated_data:
         updated_data["updated_at"] = datetime.now(timezone.utc)
+        # Pre-imagen: el precio anterior hace falta para el resumen del storefront.
+        # La post-imagen es la pre-imagen con el $set aplicado.
+        previous_product = await db["products"].find_one_and_update(
+            ownership_filter,
+            {"$set": updated_data},
+            projection={**PRODUCT_RESPONSE_PROJECTION, "business_id": 1},
+            return_document=ReturnDocument.BEFORE
+        )
+        updated_product = {**previous_product, **updated_data} if previous_product else None
+    else:
+        previous_product = updated_product = await db["products"].find_one(ownership_filter, PRODUCT_RESPONSE_PROJECTION)
 
-    await db["products"].update_one({"_id": ObjectId(product_id),"owner_id": str(current_user["_id"])}, {"$set": updated_data})
-
+    if not updated_product:
+        await raise_not_found_or_forbidden(
+            db["products"], object_id,
+            "Producto no encontrado", "No autorizado para editar este producto"
+        )
+    products_response_cache.invalidate()
+    if "price" in updated_data:
+        await on_product_price_changed(
+            db, previous_product.get("business_id"), previous_product.get("price"), updated_data["price"]
+        )
+        await seller_stats.on_price_changed(db, str(current_user["_id"]), previous_product, updated_data["price"])
 
-    
-    updated_product = await db["products"].find_one({"_id": ObjectId(product_id)})
     updated_product["_id"] = str(updated_product["_id"])
     return updated_product
 
 # 4. Eliminar un producto (DELETE /products/delete/{id})
 @router.delete("/delete/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_product(product_id: str, db = Depends(get_db), current_user = Depends(require_seller), _ = Depends(verify_product_ownership())):
-    product = await db["products"].find_one({"_id": ObjectId(product_id)})
+async def delete_product(product_id: str, db = Depends(get_db), current_user = Depends(require_seller)):
+    object_id = parse_object_id(product_id, "ID de producto inválido")
+    deleted_product = await db["products"].find_one_and_delete(
+        {"_id": object_id, "owner_id": str(current_user["_id"])},
+        projection={"business_id": 1, "owner_id": 1, "name": 1, "price": 1, "stock": 1, "category": 1}
+    )
     
-    if not product or product["owner_id"] != str(current_user["_id"]):
-        raise HTTPException(status_code=403, detail="No autorizado para eliminar este producto")
+    if not deleted_product:
+        await raise_not_found_or_forbidden(
+            db["products"], object_id,
+            "Producto no encontrado", "No autorizado para eliminar este producto"
+        )
+    products_response_cache.invalidate()
+    await on_product_deleted(db, deleted_product)
+    await seller_stats.on_product_deleted(db, deleted_product)
 
-    await db["products"].delete_one({"_id": ObjectId(product_id)})
     return {"message": "Producto eliminado"}
 
-# ...
\ No newline at end of file
+# 5. Obtener un producto (GET /products/{id}). Va la última para no tapar /get, /search...
+@router.get("/{product_id}", response_model=ProductResponse)
+async def get_product(product_id: str, db = Depends(get_read_db)):
+    object_id = parse_object_id(product_id, "ID de producto inválido")
+    # Peticiones simultáneas del mismo producto comparten una sola consulta
+    product = await product_reads.do(
+        ("product", product_id),
+        lambda: db["products"].find_one({"_id": object_id}, PRODUCT_RESPONSE_PROJECTION)
+    )
+    if not product:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Producto no encontrado")
+
+    product = dict(product)
+    product["_id"] = str(product["_id"])
+    return product
+
+# ...
@@ -1,10 +1,19 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from app.schemas.users import UserCreate, UserLogin, UserResponse, UserRole, RefreshTokenRequest
-from ..core.auth import Hash, create_access_token, create_refresh_token, refresh_access_token
-from ..core.depends import get_current_user
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, status
+from app.schemas.users import (UserCreate, UserLogin, UserResponse, UserRole, RefreshTokenRequest,
+                               LogoutRequest, SessionResponse, USER_RESPONSE_PROJECTION, USER_LOGIN_PROJECTION)
+from ..core.auth import (Hash, build_token_claims, create_access_token, create_refresh_token, refresh_access_token,
+                         REFRESH_TOKEN_DURATION)
+from ..core.sessions import session_store
+from ..core.rate_limit import login_limiter, registration_limiter
+from ..core.depends import get_current_user, revoke_tokens
 from typing import List
 from app.database import get_db
+from app.core.pagination import paginate, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.schemas.pagination import Page
+from app.core.responses import page_response
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime, timedelta, timezone
 
 router = APIRouter(
     prefix="/user",
@@ -14,29 +23,38 @@ router = APIRouter(
 
 
 @router.post("/registration", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def registration(request: UserCreate, db = Depends(get_db)):
-    existing_user = await db["users"].find_one({"email": request.email})
+async def registration(request: UserCreate, http_request: Request, db = Depends(get_db)):
+    # Límite de intentos antes de gastar CPU en bcrypt
+    await registration_limiter.check(http_request, request.email)
+    existing_user = await db["users"].find_one({"email": request.email}, {"_id": 1})
     if existing_user:
         raise HTTPException(400, "Usuario ya existe")
     
     user_data = request.model_dump(exclude={"password"})
     
-    user_data["password"] = Hash.bcrypt(request.password)
+    user_data["password"] = await Hash.bcrypt_async(request.password)
     user_data["role"] = "customer"
     
     
-    result = await db["users"].insert_one(user_data)
+    try:
+        result = await db["users"].insert_one(user_data)
+    except DuplicateKeyError:
+        # Otro registro con el mismo email ganó la carrera (índice email_unique)
+        raise HTTPException(400, "Usuario ya existe")
     
-    created_user = await db["users"].find_one({"_id": result.inserted_id})
+    created_user = await db["users"].find_one({"_id": result.inserted_id}, USER_RESPONSE_PROJECTION)
     
     created_user["_id"] = str(created_user["_id"])
     return created_user
 
 
 @router.post("/login")
-async def login(request: UserLogin, db = Depends(get_db)):
+async def login(request: UserLogin, http_request: Request, db = Depends(get_db)):
+    # Límite de intentos antes de gastar CPU en bcrypt
+    await login_limiter.check(http_request, request.email)
+
     # Buscar al usuario por el email
-    user = await db["users"].find_one({"email": request.email})
+    user = await db["users"].find_one({"email": request.email}, USER_LOGIN_PROJECTION)
     
     if not user:
         raise HTTPException(
@@ -45,20 +63,24 @@ async def login(request: UserLogin, db = Depends(get_db)):
         )
     
     # Verificar contraseña con tu clase Hash
-    if not Hash.verify(request.password, user["password"]):
+    if not await Hash.verify_async(request.password, user["password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Contraseña incorrecta"
         )
     
     # Generar el Token JWT usando tu función
-    access_token = create_access_token(data={"sub": user["email"]})
+    access_token = create_access_token(data=build_token_claims(user))
     
     refresh_token = create_refresh_token(data={"sub": user["email"]})
 
-    await db["users"].update_one(
-        {"_id": user["_id"]},
-        {"$set": {"refresh_token": refresh_token}}
+    # Una sesión por dispositivo, en su propia colección (no se reescribe el usuario)
+    await session_store.create(
+        db,
+        user_id=user["_id"],
+        refresh_token=refresh_token,
+        expires_at=datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_DURATION),
+        device=request.device or http_request.headers.get("user-agent", "")[:100] or None
     )
     return {"access_token": access_token,"refresh_token":refresh_token ,"token_type": "bearer"}
 
@@ -89,10 +111,14 @@ async def refresh_token(refresh_request: RefreshTokenRequest,db = Depends(get_db
             detail=f"Error renovando token: {str(e)}"
         )
 
-@router.get("/users", response_model=List[UserResponse])
-async def get_all_users(db = Depends(get_db), _ = Depends(get_current_user)):
-    users_cursor = db["users"].find()
-    users = await users_cursor.to_list(length=100)
+@router.get("/users", response_model=Page[UserResponse])
+async def get_all_users(
+    db = Depends(get_db),
+    _ = Depends(get_current_user),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = None
+):
+    users, next_cursor = await paginate(db["users"], {}, "_id", "asc", limit, cursor, USER_RESPONSE_PROJECTION)
     
     # IMPORTANTE: Formatear los documentos para que coincidan con el schema
     formatted_users = []
@@ -100,10 +126,11 @@ async def get_all_users(db = Depends(get_db), _ = Depends(get_current_user)):
         formatted_users.append({
             "_id": str(user["_id"]), 
             "username": user.get("username", ""),
-            "email": user.get("email", "")
+            "email": user.get("email", ""),
+            "role": user.get("role", "customer")
         })
     
-    return formatted_users
+    return page_response(formatted_users, next_cursor, UserResponse)
 
 
 
@@ -127,7 +154,41 @@ async def update_my_role(
         {"_id": ObjectId(current_user["_id"])},
         {"$set": {"role": new_role}}
     )
+    # Los tokens emitidos llevan el rol anterior: se revocan
+    await revoke_tokens(db, current_user)
     
     return {"message": f"Rol actualizado a {new_role}"}
 
 
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    request: LogoutRequest = None,
+    db = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Con refresh_token cierra solo la sesión de ese dispositivo.
+    Sin él cierra todas las sesiones y revoca todos los access tokens.
+    """
+    if request is not None and request.refresh_token:
+        session_id = session_store.hash_token(request.refresh_token)
+        await session_store.revoke(db, session_id, current_user["_id"])
+        return
+
+    await session_store.revoke_all(db, current_user["_id"])
+    await revoke_tokens(db, current_user)
+
+
+@router.get("/sessions", response_model=List[SessionResponse])
+async def get_my_sessions(db = Depends(get_db), current_user = Depends(get_current_user)):
+    """Sesiones abiertas del usuario (una por dispositivo)"""
+    return await session_store.list_for_user(db, current_user["_id"])
+
+
+@router.delete("/sessions/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_my_session(session_id: str, db = Depends(get_db), current_user = Depends(get_current_user)):
+    """Cierra la sesión de un dispositivo concreto"""
+    if not await session_store.revoke(db, session_id, current_user["_id"]):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sesión no encontrada")
+
+
@@ -1,6 +1,8 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
+from enum import Enum
+from .products import ProductResponse
 
 ###########---BUSINESS SCHEMAS---###########
 
@@ -45,6 +47,39 @@ class BusinessResponse(BusinessBase):
         }
 
 
+# Proyección de Mongo para las lecturas de negocios
+BUSINESS_RESPONSE_PROJECTION = {
+    "name": 1, "description": 1, "category": 1, "owner_id": 1,
+    "created_at": 1, "updated_at": 1,
+}
+
+
 # Esquema para la eliminación (DELETE /business/delete)
 class BusinessDelete(BaseModel):
-    id: str = Field(alias="_id")
\ No newline at end of file
+    id: str = Field(alias="_id")
+
+
+# Campos por los que se puede ordenar el listado de negocios (GET /business/get)
+class BusinessSortField(str, Enum):
+    ID = "id"
+    CREATED_AT = "created_at"
+
+
+
+# Storefront de un negocio (GET /business/{id}/storefront)
+class CategoryCount(BaseModel):
+    name: str
+    count: int
+
+class StorefrontSummary(BaseModel):
+    product_count: int
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    categories: List[CategoryCount]
+
+# Negocio + resumen + una página de sus productos
+class StorefrontResponse(BaseModel):
+    business: BusinessResponse
+    summary: StorefrontSummary
+    products: List[ProductResponse]
+    next: Optional[str] = None
@@ -0,0 +1,47 @@
+from pydantic import BaseModel, Field, field_validator
+from typing import List
+from datetime import datetime
+
+###########---CHECKOUT SCHEMAS---###########
+
+class CartItem(BaseModel):
+    product_id: str
+    quantity: int = Field(..., ge=1, le=1000)
+
+# Carrito a reservar (POST /checkout/reserve)
+class ReservationCreate(BaseModel):
+    items: List[CartItem] = Field(..., min_length=1, max_length=50)
+
+    @field_validator("items")
+    @classmethod
+    def validate_unique_products(cls, v: List[CartItem]) -> List[CartItem]:
+        ids = [item.product_id for item in v]
+        if len(ids) != len(set(ids)):
+            raise ValueError("Cada producto puede aparecer una sola vez")
+        return v
+
+class ReservedItem(BaseModel):
+    product_id: str
+    name: str
+    quantity: int
+    price: float
+
+class ReservationResponse(BaseModel):
+    id: str = Field(alias="_id")
+    items: List[ReservedItem]
+    total: float
+    status: str
+    expires_at: datetime
+
+    class Config:
+        populate_by_name = True
+
+class OrderResponse(BaseModel):
+    id: str = Field(alias="_id")
+    reservation_id: str
+    items: List[ReservedItem]
+    total: float
+    created_at: datetime
+
+    class Config:
+        populate_by_name = True
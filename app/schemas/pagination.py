@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+from typing import Generic, List, Optional, TypeVar
+from enum import Enum
+
+T = TypeVar("T")
+
+###########---PAGINATION SCHEMAS---###########
+
+class SortOrder(str, Enum):
+    ASC = "asc"
+    DESC = "desc"
+
+# Página de resultados con cursor opaco para pedir la siguiente
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next: Optional[str] = None
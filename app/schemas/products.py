@@ -1,6 +1,7 @@
-from pydantic import BaseModel,  Field, field_validator
-from typing import Optional
+from pydantic import BaseModel,  Field, field_validator, model_validator
+from typing import List, Optional
 from datetime import datetime
+from enum import Enum
 
 ###########---PRODUCTS SCHEMAS---###########
 
@@ -31,4 +32,107 @@ class ProductResponse(ProductCreate):
     updated_at: Optional[datetime] = None
 
     class Config:
-        populate_by_name = True
\ No newline at end of file
+        populate_by_name = True
+
+# Proyecciones de Mongo para las lecturas de productos
+PRODUCT_RESPONSE_PROJECTION = {
+    "name": 1, "description": 1, "price": 1, "stock": 1, "category": 1,
+    "created_at": 1, "updated_at": 1,
+}
+PRODUCT_OWNER_PROJECTION = {**PRODUCT_RESPONSE_PROJECTION, "owner_id": 1, "business_id": 1}
+
+
+# Campos por los que se puede ordenar el catálogo (GET /products/get)
+class ProductSortField(str, Enum):
+    ID = "id"
+    PRICE = "price"
+    CREATED_AT = "created_at"
+
+# Orden de la búsqueda (GET /products/search)
+class ProductSearchSort(str, Enum):
+    RELEVANCE = "relevance"
+    PRICE = "price"
+
+
+
+# Resultado de la importación masiva (POST /products/bulk)
+class BulkRowError(BaseModel):
+    row: int
+    error: str
+
+class BulkImportResult(BaseModel):
+    inserted: int
+    failed: int
+    errors: List[BulkRowError]
+    errors_truncated: bool = False
+
+
+
+# Ajuste masivo de precio/stock (POST /products/bulk-adjust)
+class ProductAdjustment(BaseModel):
+    product_id: str
+    price: Optional[float] = Field(None, gt=0)
+    stock_delta: Optional[int] = None
+    stock_set: Optional[int] = Field(None, ge=0)
+
+    @model_validator(mode="after")
+    def validate_adjustment(self):
+        if self.stock_delta is not None and self.stock_set is not None:
+            raise ValueError("Usa stock_delta o stock_set, no ambos")
+        if self.price is None and self.stock_delta is None and self.stock_set is None:
+            raise ValueError("Indica al menos price, stock_delta o stock_set")
+        return self
+
+class BulkAdjustRequest(BaseModel):
+    items: List[ProductAdjustment] = Field(..., min_length=1, max_length=1000)
+
+    @field_validator("items")
+    @classmethod
+    def validate_unique_products(cls, v: List[ProductAdjustment]) -> List[ProductAdjustment]:
+        ids = [item.product_id for item in v]
+        if len(ids) != len(set(ids)):
+            raise ValueError("Cada producto puede aparecer una sola vez")
+        return v
+
+class BulkAdjustFailure(BaseModel):
+    product_id: str
+    error: str
+
+class BulkAdjustResult(BaseModel):
+    matched: int
+    modified: int
+    failures: List[BulkAdjustFailure]
+
+# Panel del vendedor (GET /products/my-stats), servido desde el rollup seller_stats
+class CategoryStats(BaseModel):
+    name: str
+    count: int
+    units: int
+    value: float
+
+class OutOfStockProduct(BaseModel):
+    product_id: str
+    name: str
+
+class SellerStatsResponse(BaseModel):
+    product_count: int
+    total_units: int
+    inventory_value: float
+    categories: List[CategoryStats]
+    out_of_stock: List[OutOfStockProduct]
+    updated_at: Optional[datetime] = None
+
+# Facetas del catálogo (GET /products/facets)
+class CategoryFacet(BaseModel):
+    name: Optional[str] = None
+    count: int
+
+class PriceBucket(BaseModel):
+    min: float
+    max: Optional[float] = None
+    count: int
+
+class ProductFacetsResponse(BaseModel):
+    total: int
+    categories: List[CategoryFacet]
+    price_buckets: List[PriceBucket]
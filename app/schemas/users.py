@@ -1,6 +1,7 @@
 from pydantic import BaseModel, EmailStr,  Field, field_validator
 from typing import Optional
 from enum import Enum
+from datetime import datetime
 import re
 
 ###########---USER ROLE---###########
@@ -43,6 +44,7 @@ class UserCreate(BaseModel):
 class UserLogin(BaseModel):
     email: EmailStr
     password: str
+    device: Optional[str] = Field(None, max_length=100)  # Nombre del dispositivo (opcional)
 
 # Esquema para devolver datos 
 class UserResponse(BaseModel):
@@ -54,6 +56,12 @@ class UserResponse(BaseModel):
     class Config:
         populate_by_name = True
 
+# Proyecciones de Mongo: solo lo que cada lectura necesita (el password
+# solo se lee en el login)
+USER_RESPONSE_PROJECTION = {"username": 1, "email": 1, "role": 1}
+USER_PRINCIPAL_PROJECTION = {"username": 1, "email": 1, "role": 1, "token_version": 1}
+USER_LOGIN_PROJECTION = {"email": 1, "role": 1, "token_version": 1, "password": 1}
+
 
 ###########---AUTH_USER SCHEMAS---###########
 class Token(BaseModel):
@@ -63,6 +71,22 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     email: EmailStr
     token_type: Optional[str] = None 
+    user_id: Optional[str] = None
+    role: Optional[str] = None
+    version: Optional[int] = None
 
 class RefreshTokenRequest(BaseModel):
-    refresh_token: str
\ No newline at end of file
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    # Sin refresh_token se cierran las sesiones de todos los dispositivos
+    refresh_token: Optional[str] = None
+
+class SessionResponse(BaseModel):
+    id: str = Field(..., alias="_id")
+    device: Optional[str] = None
+    created_at: datetime
+    expires_at: datetime
+
+    class Config:
+        populate_by_name = True
\ No newline at end of file
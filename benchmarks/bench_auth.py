@@ -0,0 +1,107 @@
+"""
+Benchmark de autorización en /products/my-products:
+rol desde el token (modo por defecto) vs carga completa del usuario en Mongo.
+
+Arranca la app en el mismo proceso contra MONGODB_URL, crea un vendedor con
+un negocio y compara ambos modos sobreescribiendo la dependencia require_seller.
+
+Uso:
+    python -m benchmarks.bench_auth --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import httpx
+
+from app.main import app
+from app.database import connect_to_mongo, close_mongo_connection
+from app.core.depends import require_seller, require_role, principal_cache
+from app.core.hashing import hashing_engine
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _check(response: httpx.Response, step: str) -> dict:
+    if response.status_code >= 400:
+        raise RuntimeError(f"{step} falló ({response.status_code}): {response.text}")
+    return response.json()
+
+
+async def create_seller(client: httpx.AsyncClient) -> str:
+    username = f"bench_{uuid.uuid4().hex[:8]}"
+    # Dominio válido para EmailStr (email-validator rechaza .local y .test)
+    email = f"{username}@example.com"
+    password = "Password123"
+    _check(await client.post("/user/registration", json={"username": username, "email": email, "password": password}),
+           "Registro")
+    login = _check(await client.post("/user/login", json={"email": email, "password": password}), "Login")
+    headers = {"Authorization": f"Bearer {login['access_token']}"}
+    _check(await client.post("/business/add", json={"name": "Bench", "description": "bench"}, headers=headers),
+           "Alta de negocio")
+
+    # add_business revoca el token de customer: volver a loguear como seller
+    login = _check(await client.post("/user/login", json={"email": email, "password": password}), "Login")
+    return login["access_token"]
+
+
+async def run_mode(client: httpx.AsyncClient, token: str, mode: str, requests: int, concurrency: int) -> dict:
+    headers = {"Authorization": f"Bearer {token}"}
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def call():
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.get("/products/my-products", headers=headers)
+            latencies.append((time.perf_counter() - start) * 1000)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(call() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        "mode": mode,
+        "requests": requests,
+        "requests_per_second": round(requests / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    connect_to_mongo()
+    hashing_engine.start()
+    transport = httpx.ASGITransport(app=app)
+    results = []
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            token = await create_seller(client)
+
+            results.append(await run_mode(client, token, "token_claims", args.requests, args.concurrency))
+
+            # Modo lento: usuario completo desde Mongo en cada petición (sin caché)
+            app.dependency_overrides[require_seller] = require_role("seller", full_profile=True)
+            principal_cache.maxsize = 0
+            principal_cache.clear()
+            results.append(await run_mode(client, token, "full_lookup", args.requests, args.concurrency))
+    finally:
+        app.dependency_overrides.clear()
+        hashing_engine.shutdown()
+        close_mongo_connection()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,124 @@
+"""
+Benchmark de concurrencia del checkout sobre un producto "caliente".
+
+Crea un producto con --stock unidades y lanza --attempts reservas concurrentes
+(carritos de 1 unidad del producto caliente, y con --mixed también carritos
+de varios ítems que fuerzan compensaciones). Al final comprueba que:
+
+    unidades reservadas + stock restante == stock inicial  y  stock >= 0
+
+Las reservas se dejan abiertas ("pending") hasta el final, como carritos sin
+pagar: la latencia por tramos (en orden de llegada) debe mantenerse plana y
+el producto caliente no debe acumular marcas de reservas en curso.
+
+Uso:
+    python -m benchmarks.bench_checkout --stock 1000 --attempts 5000 --concurrency 200 --mixed
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app import database
+from app.core.inventory import reserve_items
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def main(args) -> int:
+    database.connect_to_mongo()
+    db = await database.get_db()
+    try:
+        now = datetime.now(timezone.utc)
+        owner_id = str(ObjectId())
+        hot = await db["products"].insert_one({
+            "name": "Producto caliente", "price": 10.0, "stock": args.stock,
+            "owner_id": owner_id, "created_at": now,
+        })
+        cold = await db["products"].insert_many([
+            {"name": f"Producto frío {i}", "price": 5.0, "stock": args.stock // 10 or 1,
+             "owner_id": owner_id, "created_at": now}
+            for i in range(5)
+        ])
+        product_ids = [hot.inserted_id] + list(cold.inserted_ids)
+        initial = {doc["_id"]: doc["stock"] async for doc in db["products"].find({"_id": {"$in": product_ids}})}
+
+        semaphore = asyncio.Semaphore(args.concurrency)
+        latencies, outcomes = [], {"reserved": 0, "conflict": 0}
+        reserved_units = {product_id: 0 for product_id in product_ids}
+        reservation_ids = []
+
+        async def attempt():
+            items = [{"product_id": str(hot.inserted_id), "quantity": 1}]
+            if args.mixed and random.random() < 0.5:
+                items.append({"product_id": str(random.choice(cold.inserted_ids)), "quantity": random.randint(1, 3)})
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    reservation = await reserve_items(db, owner_id, items)
+                    outcomes["reserved"] += 1
+                    reservation_ids.append(reservation["_id"])
+                    for item in reservation["items"]:
+                        reserved_units[ObjectId(item["product_id"])] += item["quantity"]
+                except HTTPException:
+                    outcomes["conflict"] += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(attempt() for _ in range(args.attempts)))
+        elapsed = time.perf_counter() - start
+
+        final = {doc["_id"]: doc["stock"] async for doc in db["products"].find({"_id": {"$in": product_ids}})}
+        hot_doc = await db["products"].find_one({"_id": hot.inserted_id}, {"inflight_reservations": 1})
+        # p50/p99 por quintos de la ejecución: con N carritos abiertos no debería crecer
+        size = max(1, len(latencies) // 5)
+        phases = [
+            {"phase": n + 1, "p50_ms": round(percentile(chunk, 50), 2), "p99_ms": round(percentile(chunk, 99), 2)}
+            for n, chunk in enumerate(latencies[i:i + size] for i in range(0, len(latencies), size))
+            if chunk
+        ]
+        consistent = all(
+            final[pid] >= 0 and final[pid] + reserved_units[pid] == initial[pid] for pid in product_ids
+        )
+        report = {
+            "attempts": args.attempts,
+            "concurrency": args.concurrency,
+            **outcomes,
+            "reservations_per_second": round(args.attempts / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "hot_stock_initial": initial[hot.inserted_id],
+            "hot_stock_final": final[hot.inserted_id],
+            "hot_units_reserved": reserved_units[hot.inserted_id],
+            "oversold": not consistent,
+            "latency_by_phase": phases,
+            "pending_reservations": await db["reservations"].count_documents(
+                {"_id": {"$in": reservation_ids}, "status": "pending"}
+            ),
+            "hot_inflight_marks": len(hot_doc.get("inflight_reservations", [])),
+        }
+        print(json.dumps(report, indent=2))
+
+        await db["products"].delete_many({"_id": {"$in": product_ids}})
+        await db["reservations"].delete_many({"_id": {"$in": reservation_ids}})
+        return 0 if consistent else 1
+    finally:
+        database.close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stock", type=int, default=1000)
+    parser.add_argument("--attempts", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--mixed", action="store_true")
+    sys.exit(asyncio.run(main(parser.parse_args())))
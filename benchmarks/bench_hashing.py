@@ -0,0 +1,83 @@
+"""
+Benchmark del hashing de contraseñas: síncrono (en el event loop) vs pool de procesos.
+
+Simula una ráfaga de logins (Hash.verify) mientras otra tarea hace de
+"endpoint ajeno" y mide cuánto tarda en ser atendida (latencia del event loop).
+
+Uso:
+    python -m benchmarks.bench_hashing --logins 200 --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from app.core.auth import Hash
+from app.core.hashing import hashing_engine
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def unrelated_endpoint(stop: asyncio.Event, latencies: list, interval: float = 0.005):
+    # Cada iteración representa una petición ajena que solo necesita el event loop
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        latencies.append((time.perf_counter() - start - interval) * 1000)
+
+
+async def run_scenario(mode: str, hashed: str, logins: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    stop = asyncio.Event()
+    latencies = []
+
+    async def login():
+        async with semaphore:
+            if mode == "sync":
+                Hash.verify("Password123", hashed)
+            else:
+                await Hash.verify_async("Password123", hashed)
+
+    ticker = asyncio.create_task(unrelated_endpoint(stop, latencies))
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+
+    return {
+        "mode": mode,
+        "logins": logins,
+        "logins_per_second": round(logins / elapsed, 2),
+        "unrelated_p50_ms": round(statistics.median(latencies), 2) if latencies else 0.0,
+        "unrelated_p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    hashed = Hash.bcrypt("Password123")
+    hashing_engine.start()
+    try:
+        results = [
+            await run_scenario("sync", hashed, args.logins, args.concurrency),
+            await run_scenario("process_pool", hashed, args.logins, args.concurrency),
+        ]
+    finally:
+        hashing_engine.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,75 @@
+"""
+Microbenchmark de serialización de una página de 100 productos.
+
+    current: validación con Pydantic (response_model) + jsonable_encoder + json
+    fast:    recorte a los campos del schema + orjson (app.core.responses)
+
+Uso:
+    python -m benchmarks.bench_serialization --iterations 2000
+"""
+import argparse
+import json
+import timeit
+from datetime import datetime, timezone
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.core.responses import dumps, trusted_items
+from app.schemas.pagination import Page
+from app.schemas.products import ProductResponse
+
+
+def make_docs(count: int) -> list:
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "_id": ObjectId(),
+            "name": f"Producto {i}",
+            "description": "Descripción de prueba " * 5,
+            "price": 10.5 + i,
+            "stock": 100 + i,
+            "category": "Electrónica",
+            "owner_id": str(ObjectId()),
+            "business_id": str(ObjectId()),
+            "created_at": now,
+            "update_at": now,
+        }
+        for i in range(count)
+    ]
+
+
+def current_path(docs: list, adapter: TypeAdapter) -> bytes:
+    # Lo que hace el handler + FastAPI: _id a str, validar, codificar, json.dumps
+    items = []
+    for doc in docs:
+        doc = dict(doc)
+        doc["_id"] = str(doc["_id"])
+        items.append(doc)
+    page = adapter.validate_python({"items": items, "next": None})
+    return json.dumps(jsonable_encoder(page, by_alias=True)).encode("utf-8")
+
+
+def fast_path(docs: list) -> bytes:
+    return dumps({"items": trusted_items(docs, ProductResponse), "next": None})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--items", type=int, default=100)
+    args = parser.parse_args()
+
+    docs = make_docs(args.items)
+    adapter = TypeAdapter(Page[ProductResponse])
+
+    results = {}
+    for name, fn in (("current", lambda: current_path(docs, adapter)), ("fast", lambda: fast_path(docs))):
+        seconds = timeit.timeit(fn, number=args.iterations)
+        results[name] = {"us_per_page": round(seconds / args.iterations * 1e6, 1)}
+    results["speedup"] = round(results["current"]["us_per_page"] / results["fast"]["us_per_page"], 2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
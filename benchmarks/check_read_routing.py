@@ -0,0 +1,77 @@
+"""
+Comprueba el enrutado de lecturas contra un replica set local de tres nodos.
+
+Lanza una lectura de catálogo por get_read_db y una escritura + lectura por
+get_db, y muestra qué servidor atendió cada comando (vía command monitoring).
+Las lecturas de catálogo deben ir a un secundario; escrituras y lecturas
+de autenticación, al primario.
+
+Uso:
+    MONGODB_URL="mongodb://localhost:27017,localhost:27018,localhost:27019/?replicaSet=rs0" \\
+        python -m benchmarks.check_read_routing
+"""
+import asyncio
+import json
+import sys
+from pymongo import monitoring
+
+from app import database
+
+
+class ServerRecorder(monitoring.CommandListener):
+    def __init__(self):
+        self.calls = []
+
+    def started(self, event):
+        if event.command_name in ("find", "insert", "delete"):
+            host, port = event.connection_id
+            self.calls.append((event.command_name, f"{host}:{port}"))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def main() -> int:
+    recorder = ServerRecorder()
+    monitoring.register(recorder)
+    database.connect_to_mongo()
+    try:
+        write_db = await database.get_db()
+        read_db = await database.get_read_db()
+
+        await read_db["products"].find({}).limit(1).to_list(length=1)
+        catalog_read = recorder.calls[-1]
+
+        result = await write_db["routing_check"].insert_one({"check": True})
+        write = recorder.calls[-1]
+        await write_db["routing_check"].find_one({"_id": result.inserted_id})
+        read_your_write = recorder.calls[-1]
+        await write_db["routing_check"].delete_one({"_id": result.inserted_id})
+
+        # Propiedades simples de Motor (no awaitables); tras los comandos ya se conoce la topología.
+        # Con un servidor standalone primary es None y se usa su dirección.
+        primary = database.client.primary or database.client.address
+        secondaries = database.client.secondaries
+        primary_address = f"{primary[0]}:{primary[1]}" if primary else None
+        report = {
+            "primary": primary_address,
+            "secondaries": [f"{host}:{port}" for host, port in secondaries],
+            "catalog_read": catalog_read[1],
+            "write": write[1],
+            "read_your_write": read_your_write[1],
+        }
+        print(json.dumps(report, indent=2))
+
+        ok = write[1] == primary_address and read_your_write[1] == primary_address
+        if secondaries:
+            ok = ok and catalog_read[1] != primary_address
+        return 0 if ok else 1
+    finally:
+        database.close_mongo_connection()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
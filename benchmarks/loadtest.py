@@ -0,0 +1,290 @@
+"""
+Suite de carga reproducible para los routers de users, products y business.
+
+Ejecuta la app ASGI en el mismo proceso (httpx.ASGITransport) contra un mongod
+local (MONGODB_URL) o contra un fake en memoria compatible con Motor
+(mongomock_motor, opcional). Siembra datos, lanza escenarios con la
+concurrencia indicada y emite throughput y p50/p95/p99 por endpoint en JSON.
+
+Uso:
+    python -m benchmarks.loadtest --backend mongo --scenarios login_storm catalog_browse seller_writes \\
+        --concurrency 50 --requests 2000 --sellers 50 --products-per-seller 200 --output main.json
+    python -m benchmarks.loadtest --compare main.json feature.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import httpx
+
+from app import database
+from app.main import app
+from app.core.auth import Hash, build_token_claims, create_access_token
+from app.core.hashing import hashing_engine
+from app.core.indexes import ensure_indexes
+from app.core.rate_limit import login_limiter, registration_limiter
+
+PASSWORD = "Password123"
+CATEGORIES = ["Electrónica", "Hogar", "Libros", "Deportes", "Moda", "Juguetes"]
+WORDS = ["teclado", "ratón", "monitor", "lámpara", "silla", "novela", "balón", "camiseta", "puzzle", "cable"]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def call(self, client: httpx.AsyncClient, label: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.latencies[label].append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 400:
+            self.errors[label] += 1
+        return response
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for label, values in sorted(self.latencies.items()):
+            endpoints[label] = {
+                "requests": len(values),
+                "errors": self.errors[label],
+                "rps": round(len(values) / elapsed, 2),
+                "mean_ms": round(statistics.fmean(values), 2),
+                "p50_ms": round(percentile(values, 50), 2),
+                "p95_ms": round(percentile(values, 95), 2),
+                "p99_ms": round(percentile(values, 99), 2),
+            }
+        return endpoints
+
+
+###########---SETUP---###########
+
+async def connect(backend: str):
+    if backend == "fake":
+        from mongomock_motor import AsyncMongoMockClient
+
+        database.client = AsyncMongoMockClient()
+        database.database = database.client[database.DB_NAME]
+        # Sin réplicas: las lecturas de catálogo van a la misma base
+        database.read_database = database.database
+    else:
+        database.connect_to_mongo()
+    db = await database.get_db()
+    if backend == "mongo":
+        await ensure_indexes(db)
+    return db
+
+
+async def seed(db, sellers: int, products_per_seller: int, customers: int) -> dict:
+    """Siembra vendedores con negocio y productos, y clientes. Devuelve tokens y ids."""
+    run_id = uuid.uuid4().hex[:8]
+    password_hash = Hash.bcrypt(PASSWORD)
+    now = datetime.now(timezone.utc)
+
+    users = []
+    for i in range(sellers):
+        users.append({"username": f"seller_{run_id}_{i}", "email": f"seller_{run_id}_{i}@example.com",
+                      "password": password_hash, "role": "seller", "token_version": 0})
+    for i in range(customers):
+        users.append({"username": f"customer_{run_id}_{i}", "email": f"customer_{run_id}_{i}@example.com",
+                      "password": password_hash, "role": "customer", "token_version": 0})
+    await db["users"].insert_many(users)
+
+    seller_docs = [user for user in users if user["role"] == "seller"]
+    businesses = [
+        {"name": f"Tienda {i}", "description": "Tienda de carga", "category": random.choice(CATEGORIES),
+         "owner_id": str(user["_id"]), "created_at": now}
+        for i, user in enumerate(seller_docs)
+    ]
+    if businesses:
+        await db["businesses"].insert_many(businesses)
+
+    product_ids = defaultdict(list)
+    for business in businesses:
+        batch = [
+            {"name": f"{random.choice(WORDS)} {random.choice(WORDS)} {n}",
+             "description": " ".join(random.choices(WORDS, k=8)),
+             "price": round(random.uniform(1, 500), 2), "stock": random.randint(1, 1000),
+             "category": random.choice(CATEGORIES), "owner_id": business["owner_id"],
+             "business_id": str(business["_id"]), "created_at": now}
+            for n in range(products_per_seller)
+        ]
+        if batch:
+            result = await db["products"].insert_many(batch)
+            product_ids[business["owner_id"]] = [str(_id) for _id in result.inserted_ids]
+
+    return {
+        "emails": [user["email"] for user in users],
+        "sellers": [
+            {"token": create_access_token(build_token_claims(user)), "products": product_ids[str(user["_id"])]}
+            for user in seller_docs
+        ],
+        "customers": [
+            create_access_token(build_token_claims(user)) for user in users if user["role"] == "customer"
+        ],
+    }
+
+
+###########---SCENARIOS---###########
+
+async def login_storm(client, recorder, data):
+    email = random.choice(data["emails"])
+    await recorder.call(client, "POST /user/login", "POST", "/user/login",
+                        json={"email": email, "password": PASSWORD})
+
+
+async def catalog_browse(client, recorder, data):
+    # El cursor solo vale para el orden con el que se emitió: se reenvía el mismo sort
+    sort = random.choice(["id", "price", "created_at"])
+    response = await recorder.call(client, "GET /products/get", "GET", "/products/get",
+                                   params={"limit": 20, "sort": sort})
+    next_cursor = response.json().get("next") if response.status_code == 200 else None
+    if next_cursor:
+        await recorder.call(client, "GET /products/get (next)", "GET", "/products/get",
+                            params={"limit": 20, "sort": sort, "cursor": next_cursor})
+    await recorder.call(client, "GET /business/get", "GET", "/business/get", params={"limit": 20})
+    if data["backend"] == "mongo":
+        await recorder.call(client, "GET /products/search", "GET", "/products/search",
+                            params={"q": random.choice(WORDS), "category": random.choice(CATEGORIES)})
+
+
+async def seller_writes(client, recorder, data):
+    seller = random.choice(data["sellers"])
+    headers = {"Authorization": f"Bearer {seller['token']}"}
+    response = await recorder.call(client, "POST /products/add", "POST", "/products/add", headers=headers, json={
+        "name": f"{random.choice(WORDS)} nuevo", "description": "alta de carga",
+        "price": round(random.uniform(1, 500), 2), "stock": random.randint(1, 100),
+        "category": random.choice(CATEGORIES),
+    })
+    if response.status_code == 201:
+        seller["products"].append(response.json()["_id"])
+    if seller["products"]:
+        product_id = random.choice(seller["products"])
+        await recorder.call(client, "PUT /products/update/{product_id}", "PUT", f"/products/update/{product_id}",
+                            headers=headers, json={"price": round(random.uniform(1, 500), 2)})
+    await recorder.call(client, "GET /products/my-products", "GET", "/products/my-products", headers=headers)
+
+
+SCENARIOS = {
+    "login_storm": login_storm,
+    "catalog_browse": catalog_browse,
+    "seller_writes": seller_writes,
+}
+
+
+async def run_scenario(client, name: str, data: dict, requests: int, concurrency: int) -> dict:
+    recorder = Recorder()
+    scenario = SCENARIOS[name]
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            await scenario(client, recorder, data)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {"iterations": requests, "elapsed_s": round(elapsed, 3), "endpoints": recorder.report(elapsed)}
+
+
+###########---COMPARE---###########
+
+def compare(base_path: str, head_path: str):
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(head_path) as f:
+        head = json.load(f)
+
+    rows = []
+    for scenario, result in head["scenarios"].items():
+        base_endpoints = base["scenarios"].get(scenario, {}).get("endpoints", {})
+        for label, stats in result["endpoints"].items():
+            before = base_endpoints.get(label)
+            if not before:
+                continue
+            rows.append({
+                "scenario": scenario,
+                "endpoint": label,
+                "rps": [before["rps"], stats["rps"]],
+                "p99_ms": [before["p99_ms"], stats["p99_ms"]],
+                "p99_change_pct": round((stats["p99_ms"] - before["p99_ms"]) / before["p99_ms"] * 100, 1)
+                if before["p99_ms"] else None,
+            })
+    print(json.dumps({"base": base.get("commit"), "head": head.get("commit"), "results": rows}, indent=2))
+
+
+###########---MAIN---###########
+
+def current_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+async def main(args):
+    random.seed(args.seed)
+    # El limitador protegería la app de la propia prueba de carga
+    for limiter in (login_limiter, registration_limiter):
+        limiter.per_email = limiter.per_ip = (10 ** 9, 1.0)
+
+    db = await connect(args.backend)
+    hashing_engine.start()
+    try:
+        data = await seed(db, args.sellers, args.products_per_seller, args.customers)
+        data["backend"] = args.backend
+
+        results = {}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+            for name in args.scenarios:
+                results[name] = await run_scenario(client, name, data, args.requests, args.concurrency)
+    finally:
+        hashing_engine.shutdown()
+        database.close_mongo_connection()
+
+    report = {
+        "commit": current_commit(),
+        "backend": args.backend,
+        "config": {k: v for k, v in vars(args).items() if k not in ("compare", "output")},
+        "scenarios": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=["mongo", "fake"], default="mongo")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=1000, help="Iteraciones por escenario")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--sellers", type=int, default=20)
+    parser.add_argument("--products-per-seller", type=int, default=100)
+    parser.add_argument("--customers", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "HEAD"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+    asyncio.run(main(args))